@@ -120,6 +120,32 @@ class EzClass:
             setattr(self, k, v)
 
 
+class ReadOnlyView:
+    """
+    Read-only access to mapping's values as to object's fields
+    Mapping isn't copied, so changes of mapping are visible through view
+    """
+    __slots__ = ("__data", )
+
+    def __init__(self, data):
+        object.__setattr__(self, "_ReadOnlyView__data", data)
+
+    def __getattr__(self, name:str):
+        try:
+            return self.__data[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name:str, value):
+        raise AttributeError(f"Can't set field '{name}' of read-only view!")
+
+    def __delattr__(self, name:str):
+        raise AttributeError(f"Can't delete field '{name}' of read-only view!")
+
+    def __dir__(self):
+        return [k for k in self.__data if isinstance(k, str)]
+
+
 def unsafe(f):
     """
     Decorator allows run function with unsafe code parts
@@ -191,6 +217,98 @@ def not_implemented(f):
     return wrapped
 
 
+class EscapeScanner:
+    """
+    Compiled scanner of unescaped chars in lines
+    Char is escaped if it follows escape symbol that is not escaped itself
+    Only single char escape symbol is taken into account
+    Use escape_scanner() to get cached instance
+    """
+    def __init__(self, escape_symbol:str|None, chars:str="#\\\n"):
+        self.escape_symbol = escape_symbol
+        self.chars = chars
+        if escape_symbol is None or len(escape_symbol) != 1:
+            self._escape = None
+            self._sub = None
+            others = chars
+        else:
+            self._escape = escape_symbol
+            self._sub = re.compile(f"{re.escape(escape_symbol)}(?s:.)")
+            others = chars.replace(escape_symbol, "")
+        patterns = []
+        if self._escape is not None:
+            # Escape symbol with escaped char (if there is any)
+            patterns.append(f"({re.escape(self._escape)})(?s:.)?")
+        if len(others) > 0:
+            patterns.append(f"[{''.join(re.escape(v) for v in others)}]")
+        self._regex = re.compile("|".join(patterns)) if len(patterns) > 0 else None
+        self._escape_in_chars = self._escape is not None and self._escape in chars
+
+    def positions(self, line:str) -> list[int]:
+        """
+        Positions of unescaped chars
+        """
+        if self._regex is None:
+            return []
+        if self._escape is None:
+            return [m.start() for m in self._regex.finditer(line)]
+        result = []
+        for m in self._regex.finditer(line):
+            if m.group(1) is None or self._escape_in_chars:
+                result.append(m.start())
+        return result
+
+    def is_escaped(self, line:str, pos:int) -> bool:
+        """
+        Check that char at pos is escaped
+        """
+        if self._escape is None:
+            return False
+        if pos < 0:
+            pos += len(line)
+        # Char is escaped if it follows odd amount of escape symbols
+        count = 0
+        while pos - count > 0 and line[pos - count - 1] == self._escape:
+            count += 1
+        return count % 2 == 1
+
+    def any_escaped(self, line:str, start:int, end:int|None=None) -> bool:
+        """
+        Check that any of chars from start to end (exclusive) is escaped
+        """
+        start, end, _ = slice(start, end).indices(len(line))
+        if self._escape is None or start >= end:
+            return False
+        escaped = self.is_escaped(line, start)
+        for pos in range(start, end):
+            if escaped:
+                return True
+            escaped = line[pos] == self._escape
+        return False
+
+    def replace(self, line:str, replacement_char:str) -> str:
+        """
+        Replaces escaped chars in line with replacement_char
+        """
+        if self._escape is None:
+            return line
+        return self._sub.sub(lambda m: self._escape + replacement_char, line)
+
+
+_ESCAPE_SCANNERS = {}
+
+
+def escape_scanner(escape_symbol:str|None, chars:str="#\\\n") -> EscapeScanner:
+    """
+    Cached escape scanner for escape symbol and chars to scan
+    """
+    key = (escape_symbol, chars)
+    result = _ESCAPE_SCANNERS.get(key, None)
+    if result is None:
+        result = _ESCAPE_SCANNERS[key] = EscapeScanner(escape_symbol, chars)
+    return result
+
+
 def replace_escaped(
         line:str,
         replacement_char:str,
@@ -199,18 +317,7 @@ def replace_escaped(
     """
     Replaces escaped chars in line with replacement_char
     """
-    if escape_symbol is None:
-        return line
-    result = ""
-    prev = None
-    for char in line:
-        if prev == escape_symbol:
-            result += replacement_char
-            prev = replacement_char
-        else:
-            result += char
-            prev = char
-    return result
+    return escape_scanner(escape_symbol).replace(line, replacement_char)
 
 
 def load_jyt(path: str) -> dict:
@@ -3,6 +3,7 @@ Cells Magic for Jupyter
 """
 from IPython.core.magic import Magics, magics_class, line_cell_magic
 import json
+import re
 import ruamel.yaml
 yaml = ruamel.yaml.YAML()
 from tempfile import TemporaryDirectory
@@ -13,6 +14,8 @@ from ..helpers import *
 from ..vdf.cells import Cell, CellsStream
 from ..vdf.document import Document
 from ..vdf.processing import VdfProcessor
+from ..vdf.output import SaveManager
+from ..vdf.cache import set_default_cache
 from ..builder.build_coco import build
 from ..runner.run_coco import run
 from ..third_parties.vcd2json.vcd2json import WaveExtractor
@@ -36,7 +39,7 @@ class VdfMagic(Magics):
 
     def _init_context(self, force:bool=False):
         if S_DOCUMENT not in self._context or force:
-            vp = self._context[S_PROCESSOR] = VdfProcessor()
+            vp = self._context[S_PROCESSOR] = VdfProcessor(lazy_render=True)
             doc = self._context[S_DOCUMENT] = vp.initialize_doc(Document(CellsStream([]), None, None))
             self._context[S_STAGES] = [(doc, None)]
             self._context[S_BUILD_DIR] = TemporaryDirectory()
@@ -87,11 +90,11 @@ class VdfMagic(Magics):
     def _save(self):
         self._files_saved = False
         bd = self._build_dir()
-        bd.cleanup()
         save_path = Path(bd.name)
         _, c = self._load_stage(-1)
-        for f in c.output_context.files.list:
-            f.save(save_path, flow=None)
+        # NOTE: only changed files are rewritten, files that are absent
+        # in context are removed, other build dir content is kept
+        SaveManager(save_path).save(c.output_context.files.iterate(), flow=None)
         # TODO: make symlinks to external files
         self._files_saved = True
 
@@ -105,7 +108,7 @@ class VdfMagic(Magics):
 
         files = {}
         order = 0
-        for f in c.output_context.files.list:
+        for f in c.output_context.files.iterate():
             order += 1
             files[f.path] = to_dict(
                 path = str((save_path / f.path).absolute().resolve()),
@@ -284,6 +287,14 @@ class VdfMagic(Magics):
             self._clean_temp()
             self._init_context(force=True)
 
+        # - #vdf-cache-dir:PATH to keep on-disk cache (compiled templates) in PATH
+        # - #vdf-cache-off to disable it (by default VDF_CACHE_DIR is used)
+        m = re.search(r"#cache-dir:(\S+)", line)
+        if m is not None:
+            set_default_cache(m.group(1))
+        if "#cache-off" in line:
+            set_default_cache(None)
+
         # - #vdf-load-N to load Nth cell result
         if "#load-" in line:
             # TODO: set stage to necessary
@@ -1,11 +1,234 @@
+import os
+import pickle
+import hashlib
+from pathlib import Path
+from threading import Lock, get_ident
+import jinja2
+from jinja2.bccache import BytecodeCache
+from .literals import *
 from ..helpers import *
 
+_CACHE_VER = "1"    # Bump if format of cached data is changed
+
+
+def default_cache_dir() -> Path|None:
+    """
+    Cache directory, set by VDF_CACHE_DIR environment variable
+    Cache is disabled (None is returned) if variable is not set or empty
+    """
+    path = os.environ.get(C_CACHE_DIR_ENV, "")
+    return Path(path) if path != "" else None
+
 
 class Cache:
     """
     Class for handling misc caching ops (on-drive caching)
+    Entries are kept in files within cache directory, grouped by namespace
+    Least recently used entries are evicted when total size exceeds limit
+    Any error of cache directory access disables cache, so cache never
+    breaks processing
+    If path is None then VDF_CACHE_DIR is used
+    If enabled is None then cache is enabled if there is any directory
+    NOTE: nothing is written into cache directory until first put
     """
+    def __init__(
+            self,
+            path:str|Path|None=None,
+            max_size:int=C_CACHE_MAX_SIZE,
+            enabled:bool|None=None,
+    ):
+        self.path = Path(path) if path is not None else default_cache_dir()
+        self.max_size = max_size
+        self.enabled = self.path is not None and enabled is not False
+        self.hits = 0
+        self.misses = 0
+        self._size = None   # Total size of entries, scanned on first put
+        self._lock = Lock()
+
+    @staticmethod
+    def _key(key:str) -> str:
+        return hashlib.sha256(f"{_CACHE_VER}|{key}".encode()).hexdigest()
+
+    def _entry_path(self, namespace:str, key:str) -> Path:
+        return self.path / namespace / self._key(key)
+
+    def get(self, namespace:str, key:str) -> bytes|None:
+        """
+        Get data of entry, None if there is no such entry
+        """
+        if not self.enabled:
+            return None
+        path = self._entry_path(namespace, key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # Mark as recently used
+            self.hits += 1
+            return data
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except OSError:
+            self.enabled = False
+            return None
+
+    def put(self, namespace:str, key:str, data:bytes):
+        """
+        Put data of entry into cache
+        """
+        if not self.enabled:
+            return
+        path = self._entry_path(namespace, key)
+        tmp_path = path.with_name(
+            f"{path.name}.{os.getpid()}.{get_ident()}{C_TEMP_SUFFIX}")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            with self._lock:
+                if self._size is None:
+                    self._size = self._scan_size()
+                else:
+                    self._size += len(data)
+                if self._size > self.max_size:
+                    self._evict()
+        except OSError:
+            self.enabled = False
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        result = []
+        for namespace in self.path.iterdir():
+            if not namespace.is_dir():
+                continue
+            for path in namespace.iterdir():
+                if path.name.endswith(C_TEMP_SUFFIX):
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                result.append((stat.st_mtime, stat.st_size, path))
+        return result
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """
+        Remove least recently used entries until size is 3/4 of limit
+        """
+        entries = sorted(self._entries(), key=lambda v: v[0])
+        size = sum(v[1] for v in entries)
+        for _, entry_size, path in entries:
+            if size <= self.max_size * 3 // 4:
+                break
+            path.unlink(missing_ok=True)
+            size -= entry_size
+        self._size = size
+
+    def get_object(self, namespace:str, key:str):
+        """
+        Get pickled object, None if there is no such entry
+        """
+        data = self.get(namespace, key)
+        if data is None:
+            return None
+        try:
+            return pickle.loads(data)
+        except Exception:
+            return None
+
+    def put_object(self, namespace:str, key:str, value):
+        """
+        Put object into cache (object is pickled)
+        """
+        if self.enabled:
+            self.put(namespace, key, pickle.dumps(value))
+
+    def clear(self):
+        """
+        Remove all entries
+        """
+        if not self.enabled or not self.path.exists():
+            return
+        with self._lock:
+            for _, _, path in self._entries():
+                path.unlink(missing_ok=True)
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def entries(self) -> int:
+        """
+        Amount of entries in cache directory
+        """
+        if not self.enabled or not self.path.exists():
+            return 0
+        return len(self._entries())
+
+    def stats(self) -> dict:
+        return to_dict(
+            hits = self.hits,
+            misses = self.misses,
+            entries = self.entries(),
+            max_size = self.max_size,
+        )
+
 
-    @not_implemented
-    def __init__(self):
-        pass
\ No newline at end of file
+class JinjaBytecodeCache(BytecodeCache):
+    """
+    Jinja2 bytecode cache over Cache
+    Entries are keyed by template's hash, Jinja2 version and environment kind
+    If cache is None then default cache is used (it's taken on first use)
+    """
+    def __init__(self, cache:Cache|None=None):
+        self._cache = cache
+
+    @property
+    def cache(self) -> Cache:
+        return self._cache if self._cache is not None else default_cache()
+
+    def _key(self, bucket) -> str:
+        return f"{jinja2.__version__}|{type(bucket.environment).__name__}" \
+            f"|{bucket.key}|{bucket.checksum}"
+
+    def load_bytecode(self, bucket):
+        if not self.cache.enabled:
+            return
+        data = self.cache.get(C_CACHE_JINJA, self._key(bucket))
+        if data is not None:
+            bucket.bytecode_from_string(data)
+
+    def dump_bytecode(self, bucket):
+        if not self.cache.enabled:
+            return
+        self.cache.put(C_CACHE_JINJA, self._key(bucket), bucket.bytecode_to_string())
+
+    def clear(self):
+        self.cache.clear()
+
+
+_DEFAULT_CACHE = None
+
+
+def default_cache() -> Cache:
+    """
+    Cache that is shared by all VDF's parts
+    It's created on first use. Disabled unless VDF_CACHE_DIR is set
+    or cache directory is set with set_default_cache()
+    """
+    global _DEFAULT_CACHE
+    if _DEFAULT_CACHE is None:
+        _DEFAULT_CACHE = Cache()
+    return _DEFAULT_CACHE
+
+
+def set_default_cache(path:str|Path|None):
+    """
+    Set directory of cache that is shared by all VDF's parts
+    If path is None then cache is disabled
+    NOTE: it's for entry points (i.e. magic), it affects all processors
+    """
+    global _DEFAULT_CACHE
+    _DEFAULT_CACHE = Cache(path, enabled=path is not None)
@@ -1,4 +1,3 @@
-from copy import deepcopy
 from hashlib import md5
 from .literals import *
 from .source_io import Line, Fenced
@@ -20,10 +19,16 @@ class Cell:
         self._content = content
         self._name = name
         self._hash = None
+        self._raw_lines = None  # Cached content as strings
+        self._flat_lines = None # Cached content as lines
         self._location = location
         self.input_context = input_context
-        self.run_context = deepcopy(input_context)
-        self.output_context = deepcopy(input_context)
+        if input_context is not None:
+            self.run_context = input_context.snapshot()
+            self.output_context = input_context.snapshot()
+        else:
+            self.run_context = None
+            self.output_context = None
         self.tags = tags
         self.stdout = []    # Accumulated stdout of tags
         self.stderr = []    # Accumulated stderr of tags
@@ -69,15 +74,44 @@ class Cell:
         return self._hash
 
     def raw_lines(self) -> list[str]:
-        result = []
-        for v in self.content:
-            result += v.raw_lines()
-        return result
+        """
+        Content as list of strings
+        NOTE: list is shared, don't modify it
+        """
+        if self._raw_lines is None:
+            result = []
+            for v in self._content:
+                result += v.raw_lines()
+            self._raw_lines = result
+        return self._raw_lines
 
     def flat_lines(self) -> list[Line]:
-        result = []
-        for v in self.content:
-            result += v.flat_lines()
+        """
+        Content as list of lines
+        NOTE: list is shared, don't modify it
+        """
+        if self._flat_lines is None:
+            result = []
+            for v in self._content:
+                result += v.flat_lines()
+            self._flat_lines = result
+        return self._flat_lines
+
+    def shifted(self, delta:int):
+        """
+        Copy of cell with lines indexes shifted by delta
+        Hash is kept as content is the same
+        NOTE: for parsed cells only, contexts and tags are not copied
+        """
+        location = self.location
+        if len(location) > 0 and isinstance(location[-1], int):
+            location[-1] += delta
+        result = type(self)(
+            [v.shifted(delta) for v in self._content],
+            location,
+            name=self._name,
+        )
+        result._hash = self._hash
         return result
 
 
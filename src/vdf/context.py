@@ -1,14 +1,174 @@
+from collections.abc import MutableMapping
+from itertools import count
+from .literals import *
 # from .files import Files
 
 
+_DELETED = object() # Marks value that is deleted in scope but exists in parent
+_REVISIONS = count(1)   # Source of scopes' content revisions
+
+
+class Scope(MutableMapping):
+    """
+    Copy-on-write layered mapping
+    Scope's own values overlay values of parent scope
+    Parents are never modified, so snapshot costs O(1):
+    current own values are frozen into new parent that is shared
+    by the scope and it's snapshot
+    Each change of scope gets unique revision, snapshots inherit revision,
+    so scopes with same revision has same content
+    """
+    # Chain is squashed into single dict when it's getting deeper than this
+    _MAX_DEPTH = 32
+
+    def __init__(self, data:dict|None=None, parent=None):
+        self._own = {**data} if data else {}
+        self._parent = parent
+        self._depth = 0 if parent is None else parent._depth + 1
+        self._rev = next(_REVISIONS)
+
+    @property
+    def revision(self) -> int:
+        return self._rev
+
+    def _chain(self) -> list[dict]:
+        """
+        Own dicts of all scopes in chain, starting from root
+        """
+        result = []
+        scope = self
+        while scope is not None:
+            result.append(scope._own)
+            scope = scope._parent
+        result.reverse()
+        return result
+
+    def _freeze(self):
+        """
+        Move own values into new parent so they can be shared
+        """
+        if len(self._own) == 0:
+            return
+        if self._depth >= self._MAX_DEPTH:
+            base = Scope(dict(self.items()))
+        else:
+            base = Scope.__new__(Scope)
+            base._own = self._own
+            base._parent = self._parent
+            base._depth = self._depth
+        base._rev = self._rev
+        self._own = {}
+        self._parent = base
+        self._depth = base._depth + 1
+
+    def snapshot(self):
+        """
+        Get copy of scope. Changes of copy or of self
+        are not visible to each other
+        """
+        self._freeze()
+        result = Scope.__new__(Scope)
+        result._own = {}
+        result._parent = self._parent
+        result._depth = self._depth
+        result._rev = self._rev
+        return result
+
+    def child(self):
+        """
+        Get new scope on top of current values of self
+        """
+        self._freeze()
+        result = Scope(None, self._parent)
+        result._rev = self._rev
+        return result
+
+    def __getitem__(self, key):
+        scope = self
+        while scope is not None:
+            if key in scope._own:
+                value = scope._own[key]
+                if value is _DELETED:
+                    break
+                return value
+            scope = scope._parent
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        self._own[key] = value
+        self._rev = next(_REVISIONS)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._rev = next(_REVISIONS)
+        if self._parent is not None and key in self._parent:
+            self._own[key] = _DELETED
+        else:
+            del self._own[key]
+
+    def _flat(self) -> dict:
+        result = {}
+        for own in self._chain():
+            for k,v in own.items():
+                if v is _DELETED:
+                    result.pop(k, None)
+                else:
+                    result[k] = v
+        return result
+
+    def __iter__(self):
+        return iter(self._flat())
+
+    def __len__(self) -> int:
+        return len(self._flat())
+
+    def __contains__(self, key) -> bool:
+        scope = self
+        while scope is not None:
+            if key in scope._own:
+                return scope._own[key] is not _DELETED
+            scope = scope._parent
+        return False
+
+    def __deepcopy__(self, memo):
+        # NOTE: values are never modified in place, only rebound,
+        # so snapshot is sufficient
+        return self.snapshot()
+
+    def __repr__(self) -> str:
+        return f"Scope({self._flat()!r})"
+
+
 class Vars:
     """
     Variables collection
     Class is required since complex things like scope would be used
     """
-    def __init__(self, vars:dict):
+    def __init__(self, vars:dict|Scope):
         self.data = vars
-        # TODO: var's scopes
+
+    @property
+    def data(self) -> Scope:
+        return self._data
+
+    @data.setter
+    def data(self, value:dict|Scope):
+        if not isinstance(value, Scope):
+            value = Scope(value)
+        self._data = value
+
+    def snapshot(self):
+        """
+        Get copy of vars collection, copy costs O(1)
+        """
+        return Vars(self._data.snapshot())
+
+    def child(self):
+        """
+        Get nested vars scope
+        """
+        return Vars(self._data.child())
 
 
 class Attrs:
@@ -16,9 +176,25 @@ class Attrs:
     Attributes collection
     Class to handle things that can't be foreseen now
     """
-    def __init__(self, attrs:dict):
+    def __init__(self, attrs:dict|Scope):
         self.data = attrs
 
+    @property
+    def data(self) -> Scope:
+        return self._data
+
+    @data.setter
+    def data(self, value:dict|Scope):
+        if not isinstance(value, Scope):
+            value = Scope(value)
+        self._data = value
+
+    def snapshot(self):
+        """
+        Get copy of attributes collection, copy costs O(1)
+        """
+        return Attrs(self._data.snapshot())
+
 
 class RunContext:
     """
@@ -50,6 +226,32 @@ class RunContext:
     def attrs(self) -> Attrs:
         return self._attrs
 
+    def provenance(self) -> bool:
+        """
+        Whether sources of generated lines should be tracked
+        Controlled by attribute 'provenance' (True if not set)
+        """
+        return self._attrs.data.get(S_PROVENANCE, True) is not False
+
+    def revision(self) -> tuple:
+        """
+        Token of vars and attrs content
+        Tokens are equal if content wasn't changed since snapshot
+        """
+        return (self._vars.data.revision, self._attrs.data.revision, self.vdf_ver)
+
+    def snapshot(self):
+        """
+        Get copy of context
+        Vars, attrs and files content are copied on write
+        """
+        return RunContext(
+            files   = self._files.clone() if self._files is not None else None,
+            vars    = self._vars.snapshot(),
+            attrs   = self._attrs.snapshot(),
+            vdf_ver = self.vdf_ver,
+        )
+
 
 class GeneratedLine:
     """
@@ -58,12 +260,15 @@ class GeneratedLine:
     """
     def __init__(self,
             content :str,
-            source  :list[list],
-            context :RunContext
+            source  :list[list]|None,
+            context :RunContext,
+            flows   :list[str]|None = None,
     ):
         self.content = content
-        self.source = [*source]
+        self.source = [*source] if source is not None else None
         self.context = context
+        self.flows = [*flows] if flows is not None else None
+        # NOTE: line with flows set to None is for all flows
         # NOTE: source line location is rather abstract
         # but recommended content is:
         # - VDF file location
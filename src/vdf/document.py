@@ -1,10 +1,10 @@
 # Classes for handling large VDF structures
-from copy import deepcopy
 from .literals import *
 from ..helpers import *
 from .context import Vars, Attrs, RunContext
 from .cells import Cell, CellsStream
 from .files import Files
+from .persistent import PersistentList, PersistentMultiMap
 
 
 class Episode:
@@ -30,21 +30,71 @@ class Episode:
 class Arc:
     """
     Storage for series of episodes
+    Episodes are kept in append-only persistent list,
+    so forks of arc are cheap and share all episodes
     """
     def __init__(
             self,
-            episodes: list[Episode],
+            episodes: list[Episode]|PersistentList,
     ):
+        if not isinstance(episodes, PersistentList):
+            episodes = PersistentList(episodes)
         self.episodes = episodes
 
+    def fork(self):
+        return Arc(self.episodes.fork())
+
+
+class _EpisodesIndex:
+    """
+    Index of document's episodes by cell name and by source cell location
+    Each entry refers episode as a tuple of branch name and episode idx in branch
+    """
+    def __init__(self):
+        self._names = PersistentMultiMap()
+        self._locations = PersistentMultiMap()
+
+    def fork(self):
+        result = _EpisodesIndex.__new__(_EpisodesIndex)
+        result._names = self._names.fork()
+        result._locations = self._locations.fork()
+        return result
+
+    def register(self, branch_name:str, idx:int, episode:Episode):
+        """
+        Add episode into index
+        """
+        if episode.cell is not None:
+            self._names.add(episode.cell.name, (branch_name, idx))
+        location = tuple(episode.source_cell_location or ())
+        self._locations.add(location, (branch_name, idx))
+
+    def by_name(self, name:str) -> tuple[str,int]|None:
+        # NOTE: only first episode with the name is used, same as linear lookup did
+        return self._names.first(name)
+
+    def by_location(self, location:list) -> list[tuple[str,int]]:
+        return self._locations.all(tuple(location or ()))
+
+    def names(self) -> list[str]:
+        return self._names.keys()
+
 
 class Story:
     """
     Contains story data and methods to work with it
     """
-    def __init__(self, arc:Arc, parent:Episode):
+    def __init__(
+            self,
+            arc:Arc,
+            parent:Episode,
+            name:str|None=None,
+            index:_EpisodesIndex|None=None,
+    ):
         self.arc = arc  # Contains context for each episode in story
         self.parent = parent
+        self._name = name
+        self._index = index # Document's index, updated on append
 
     @property
     def last_episode(self) -> (Episode|None):
@@ -53,8 +103,16 @@ class Story:
         else:
             return None
 
+    def fork(self, index:_EpisodesIndex|None):
+        """
+        Make a snapshot of story that is bound to specified index
+        """
+        return Story(self.arc.fork(), self.parent, self._name, index)
+
     def append(self, episode:Episode):
         self.arc.episodes.append(episode)
+        if self._index is not None:
+            self._index.register(self._name, len(self.arc.episodes)-1, episode)
 
 
 class Stories:
@@ -67,6 +125,12 @@ class Stories:
     def by_name(self, name) -> (Story|None):
         return self.data.get(name, None)
 
+    def fork(self, index:_EpisodesIndex|None):
+        """
+        Make a snapshot of all stories that are bound to specified index
+        """
+        return Stories({k:v.fork(index) for k,v in self.data.items()})
+
 
 class Document:
     """
@@ -82,6 +146,7 @@ class Document:
         self._frontmatter = frontmatter # Frontmatter part
         self._source = source           # Document's source cell's (cells that are not processed)
         self._branches = Stories({})    # Registered cell's branches
+        self._index = _EpisodesIndex()  # Episodes by cell name / location
         self._root_context = root_context or RunContext(
             files=Files([]),
             vars=Vars({}),
@@ -110,17 +175,26 @@ class Document:
     def default_branch(self) -> str:
         return self._default_branch
 
-    @critical_todo
     def clone(self):
         """
-        Properly clone self to save space but preserve references
+        Clone self to save space but preserve references
+        History is shared with the clone, appends made to clone
+        (or to self) after cloning are not visible to each other
         """
         result = Document(self._source, self._frontmatter, self._root_context)
-        # TODO: will it save refs to source from cells?
-        result._branches = deepcopy(self._branches)
+        result._index = self._index.fork()
+        result._branches = self._branches.fork(result._index)
         result._default_branch = self._default_branch
         return result
 
+    def _episode_info(self, ref:tuple[str,int]) -> dict:
+        branch_name, idx = ref
+        return {
+            "branch"        : branch_name,
+            "episode_idx"   : idx,
+            "episode"       : self.branches.data[branch_name].arc.episodes[idx],
+        }
+
     def named_episodes(self) -> dict[str:Cell]:
         """
         Get all episodes with named cells
@@ -131,18 +205,18 @@ class Document:
         - episode ref
         """
         result = {}
-        for k,v in self.branches.data.items():
-            i = -1
-            for ep in v.arc.episodes:
-                i += 1
-                if ep.cell.name[:1] != "_":
-                    result[ep.cell.name] = {
-                        "branch"        : k,
-                        "episode_idx"   : i,
-                        "episode"       : ep,
-                    }
+        for name in self._index.names():
+            if name[:1] != "_":
+                result[name] = self._episode_info(self._index.by_name(name))
         return result
 
+    def is_name_taken(self, cell_name:str) -> bool:
+        """
+        Check if there is an episode with named cell
+        Same as `cell_name in named_episodes()` but doesn't walk through episodes
+        """
+        return cell_name[:1] != "_" and self._index.by_name(cell_name) is not None
+
     def lookup_episode_by_cell_name(self, cell_name:str) -> dict|None:
         """
         Lookup stage by cell name
@@ -152,18 +226,21 @@ class Document:
         - episode idx in branch
         - episode ref
         """
-        for k,v in self.branches.data.items():
-            i = -1
-            for ep in v.arc.episodes:
-                i += 1
-                if ep.cell.name == cell_name:
-                    result = {
-                        "branch"        : k,
-                        "episode_idx"   : i,
-                        "episode"       : ep,
-                    }
-                    return result
-        return None
+        ref = self._index.by_name(cell_name)
+        if ref is None:
+            return None
+        return self._episode_info(ref)
+
+    def lookup_episodes_by_location(self, location:list) -> list[dict]:
+        """
+        Lookup stages by source cell location
+        Episodes are returned in order they were added into document
+        Each item is a dict with:
+        - branch_name
+        - episode idx in branch
+        - episode ref
+        """
+        return [self._episode_info(v) for v in self._index.by_location(location)]
 
     def last_episode_in_branch(
             self,
@@ -195,5 +272,6 @@ class Document:
         Make sure branch exists. If not create one
         """
         if branch_name not in self.branches.data:
-            self.branches.data[branch_name] = Story(Arc([]), parent)
+            story = Story(Arc([]), parent, branch_name, self._index)
+            self.branches.data[branch_name] = story
         return self.branches.data[branch_name]
@@ -1,7 +1,15 @@
+import os
+import codecs
+import shutil
+from itertools import repeat
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pathlib import Path
+from copy import copy
 from .literals import *
 from ..helpers import *
-from .context import RunContext, GeneratedLine
+from .context import RunContext, Vars, Attrs, GeneratedLine
+from .persistent import PersistentList
+from .source_map import map_entry, SourceMapWriter
 from . import files_render
 
 _RENDERS   = (files_render, )
@@ -104,19 +112,50 @@ class File:
                     raise ValueError(
                         f"Section '{k}' is missing in sections_data!")
             # TODO: moar sanity check
-            self.sections_data = sections_data
+            self.sections_data = {
+                k:{kk:PersistentList(vv) for kk,vv in v.items()}
+                for k,v in sections_data.items()
+            }
         else:
             self.sections_data = {k:{} for k in self._file_spec.sections}
         # First key of sections data - section name
         # Second key - subsection name (to group parts of code within section)
+        # Subsections are persistent lists, so they are shared between
+        # file's clones until modified
         self.rendered = None  # Rendered lines or None
+        self.rendered_sources = None  # Source of each rendered line
+        # NOTE: rendered_sources stays None if provenance is off
+        self.rendered_flows = None  # Flows of each rendered line
+        # NOTE: rendered_flows is None if all lines are for all flows
         self.vars = vars or {}
         self._render = self._file_spec.render()
+        self._dirty = {}            # Modified subsections by section (None if all)
+        self._render_cache = {}     # Data of previous renders to be reused
+        self._render_token = None   # Token of previous render's context
+        self._lazy_context = None   # Context for deferred render
 
     @property
     def path(self) -> str:
         return self._path + self._file_spec.ext
 
+    def clone(self):
+        """
+        Get copy of file
+        Subsections' lines are shared with the copy and copied
+        only when subsection is modified by copy (or by self)
+        """
+        result = copy(self)
+        result.sections_data = {
+            k:{kk:vv.fork() for kk,vv in v.items()}
+            for k,v in self.sections_data.items()
+        }
+        result.vars = {**self.vars}
+        result._render = self._file_spec.render()
+        result._dirty = {
+            k:(None if v is None else {*v}) for k,v in self._dirty.items()}
+        result._render_cache = {**self._render_cache}
+        return result
+
     def get_template(self) -> str:
         return self._file_spec.template
 
@@ -148,68 +187,443 @@ class File:
                     " Mixing raw and other code sections is not allowed!")
         if subsection == C_ALL and append:
             raise ValueError(f"Append is not allowed with subsection '{C_ALL}'!")
+        if subsection == C_ALL:
+            self._dirty[section] = None
+        elif self._dirty.get(section, set()) is not None:
+            self._dirty.setdefault(section, set()).add(subsection)
         if subsection != C_ALL \
         and subsection not in self.sections_data[section]:
-            self.sections_data[section][subsection] = []
+            self.sections_data[section][subsection] = PersistentList()
         if not append:
             if subsection == C_ALL:
                 self.sections_data[section] = {}
                 # TODO: line below is not so obvious... doc it or remove it
                 subsection = C_DEFAULT
-            self.sections_data[section][subsection] = [] + value
+            self.sections_data[section][subsection] = PersistentList(value)
         else:
-            self.sections_data[section][subsection] += value
+            self.sections_data[section][subsection].extend(value)
+
+    def is_dirty(self, section:str, subsection:str) -> bool:
+        """
+        Check if subsection was modified since last render
+        """
+        if section not in self._dirty:
+            return False
+        return self._dirty[section] is None or subsection in self._dirty[section]
+
+    def get_render_cache(self) -> dict:
+        """
+        Data of previous renders that can be reused by render
+        Valid only while render context is same
+        """
+        return self._render_cache
+
+    def _render_context_token(self, context:RunContext) -> tuple:
+        return context.revision(), {**self.vars}
+
+    def needs_render(self, context:RunContext) -> bool:
+        """
+        Check if file were modified or context were changed since last render
+        """
+        return self.rendered is None \
+            or len(self._dirty) > 0 \
+            or self._render_token != self._render_context_token(context)
 
-    def render(self, context:RunContext):
+    def render(self, context:RunContext, lazy:bool=False):
         """
         Render structured content into flat text
+        Output of sections that weren't modified since previous render
+        is reused if context is the same
+        If lazy is True then context is only kept and rendering is deferred
+        until output is required (saves or save are called)
         NOTE: rendered data is kept internally and contains extra info
         To get final result - use saves or save
         """
+        if lazy:
+            self._lazy_context = context
+            return
+        self._lazy_context = None
+        self._render_now(context)
+
+    def _render_now(self, context:RunContext):
+        token = self._render_context_token(context)
+        if token != self._render_token:
+            self._render_cache = {}
         self.rendered = None
-        self.rendered = self._render.render(self, context)
+        self.rendered, self.rendered_sources, self.rendered_flows = \
+            self._render.render(self, context)
+        self._render_token = token
+        self._dirty = {}
 
-    def saves(self, flow=None) -> tuple[list[str], list[str]]:
+    def _render_stream(self, context:RunContext):
         """
-        Save final result into list of strings
-        Mapping with info about line's sources is saved along
+        Render file, yielding lines and their sources one by one
+        Rendered lines aren't kept, neither in file nor in renders' cache
         """
+        token = self._render_context_token(context)
+        if token != self._render_token:
+            self._render_cache = {}
+        self.rendered = None
+        self.rendered_sources = None
+        self.rendered_flows = None
+        yield from self._render.iter_render(self, context, use_cache=False)
+        self._render_token = token
+        self._dirty = {}
+
+    def render_snapshot(self, context:RunContext) -> tuple:
+        """
+        Picklable snapshot of everything that is required to render file
+        Contexts are flattened into plain dicts
+        (lines of tag application share single context in snapshot)
+        """
+        contexts = {}
+        def flat(context:RunContext) -> RunContext:
+            if id(context) not in contexts:
+                contexts[id(context)] = (context, RunContext(
+                    files   = None,
+                    vars    = Vars(dict(context.vars.data)),
+                    attrs   = Attrs(dict(context.attrs.data)),
+                    vdf_ver = context.vdf_ver,
+                ))
+            return contexts[id(context)][1]
+        sections_data = {
+            k:{
+                kk:[
+                    GeneratedLine(l.content, l.source, flat(l.context), l.flows)
+                    for l in vv
+                ]
+                for kk,vv in v.items()
+            }
+            for k,v in self.sections_data.items()
+        }
+        return (
+            type(self), self._path, self.kind, self.encoding, self.eol,
+            self._file_spec, sections_data, {**self.vars}, flat(context),
+        )
+
+    def apply_render(self, context:RunContext, rendered:tuple[list,list,list]):
+        """
+        Set result of render that was done elsewhere (i.e. on snapshot)
+        NOTE: renders' cache is dropped since it's not updated by such render
+        """
+        self._lazy_context = None
+        self._render_cache = {}
+        self.rendered, self.rendered_sources, self.rendered_flows = rendered
+        self._render_token = self._render_context_token(context)
+        self._dirty = {}
+
+    def ensure_rendered(self):
+        """
+        Make sure that rendered data is up to date
+        For lazy render file is rendered if it was modified since last render
+        """
+        if self._lazy_context is not None \
+        and self.needs_render(self._lazy_context):
+            self._render_now(self._lazy_context)
         if self.rendered is None:
-            self.render()
+            raise ValueError(f"File '{self.path}' were not rendered yet!")
+
+    @staticmethod
+    def _in_flow(flow:str|None, flows:list[str]|None) -> bool:
+        """
+        Check that line with given flows belongs to flow
+        (None flow means all lines, None flows means line is for all flows)
+        """
+        return flow is None or flows is None or flow in flows
+
+    def _rendered_stream(self):
+        """
+        Final lines with their sources and flows as an iterator
+        and whether sources are tracked
+        If rendering was deferred (lazy render) then lines are streamed
+        directly from render and whole file's content isn't kept in memory
+        """
+        if self._lazy_context is not None \
+        and self.needs_render(self._lazy_context):
+            return self._render_stream(self._lazy_context), \
+                self._lazy_context.provenance()
+        self.ensure_rendered()
+        return zip(
+            self.rendered,
+            self.rendered_sources or repeat(None),
+            self.rendered_flows or repeat(None),
+        ), self.rendered_sources is not None
+
+    def _flow_lines(self, flow:str|None=None) -> tuple[list[str], list]:
+        """
+        Rendered lines and their sources for specified flow
+        Sources are None if provenance is off
+        """
+        self.ensure_rendered()
+        if flow is None or self.rendered_flows is None:
+            return self.rendered, self.rendered_sources
+        stream, provenance = self._rendered_stream()
         lines = []
-        lines_map = []
-        for l  in self.rendered:
-            f_line = self._render.finalize_line(l, flow)
-            if f_line is None:
-                continue
-            line, l_map = f_line
-            lines.append(line)
-            lines_map.append(l_map)
-        return lines, lines_map
+        sources = [] if provenance else None
+        for line, source, flows in stream:
+            if self._in_flow(flow, flows):
+                lines.append(line)
+                if sources is not None:
+                    sources.append(source)
+        return lines, sources
+
+    def saves(
+            self,
+            flow:str|list[str]|None=None,
+    ) -> tuple[list[str], list[str]|None] | dict[str, tuple]:
+        """
+        Save final result into list of strings
+        Mapping with info about line's sources is saved along
+        (mapping is None if provenance is off)
+        If flow is specified then only lines of that flow are saved
+        If list of flows is specified then result is a dict
+        with result for each flow
+        """
+        if isinstance(flow, list):
+            return {v:self.saves(v) for v in flow}
+        lines, sources = self._flow_lines(flow)
+        if sources is None:
+            return [*lines], None
+        return [*lines], [map_entry(v) for v in sources]
 
-    def save(self, output_path:str, flow=None, save_map=True) -> bool:
+    def save(
+            self,
+            output_path:str,
+            flow:str|list[str]|None=None,
+            save_map=True,
+            map_format:str=C_MAP_JSON,
+    ) -> bool:
         """
         Save final result into file by specified path
         Mapping with info about line's sources is saved along
+        Map is saved as JSON lines or in compact indexed format
+        (see source_map.py) depending on map_format
+        Map isn't saved if provenance is off
+        If flow is specified then only lines of that flow are saved
+        If list of flows is specified then result for each flow
+        is saved into flow's subdirectory of output path.
+        All flows are written in a single pass over rendered lines
         """
-        if self.rendered is None:
-            self.render()
-        lines, lines_map = self.saves(flow)
-        file_path = Path(output_path) / self.path
-        map_path = Path(output_path) / f"{self.path}.map"
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        if file_path.exists():
-            file_path.unlink()
-        if map_path.exists():
-            map_path.unlink()
-        lines_encoded = self.eol.join(lines).encode(self.encoding)
-        with open(file_path, "wb") as f:
-            f.write(lines_encoded)
-        if save_map:
-            with open(map_path, "w") as f:
-                f.writelines("\n".join(lines_map))
+        if isinstance(flow, list):
+            targets = [(v, Path(output_path) / v) for v in flow]
+        else:
+            targets = [(flow, Path(output_path))]
+        paths = []
+        for flow_name, flow_path in targets:
+            file_path = flow_path / self.path
+            map_path = flow_path / f"{self.path}.map"
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            if file_path.exists():
+                file_path.unlink()
+            if map_path.exists():
+                map_path.unlink()
+            paths.append((flow_name, file_path, map_path if save_map else None))
+        self._write(paths, map_format)
         return True
 
+    def write(
+            self,
+            file_path:str,
+            map_path:str|None=None,
+            flow:str|None=None,
+            map_format:str=C_MAP_JSON,
+    ) -> bool:
+        """
+        Write final result into file_path and mapping into map_path
+        Lines are encoded and written one by one along with map
+        Returns True if map were written
+        (map isn't written if map_path is None or provenance is off)
+        """
+        writer = self._write([(flow, file_path, map_path)], map_format)[0]
+        return writer.map_writer is not None
+
+    def update(
+            self,
+            file_path:str,
+            map_path:str|None=None,
+            flow:str|None=None,
+            map_format:str=C_MAP_JSON,
+    ) -> tuple[bool, bool]:
+        """
+        Same as write but existing file and map are rewritten only
+        if their content is changed, so unchanged files aren't touched at all
+        Returns True if map were written and True if anything were written
+        """
+        writer = self._write([(flow, file_path, map_path)], map_format, True)[0]
+        return writer.map_writer is not None, writer.changed
+
+    def _write(
+            self,
+            targets:list[tuple],
+            map_format:str,
+            update:bool=False,
+    ) -> list["_FileWriter"]:
+        """
+        Write final result for multiple flows in a single pass
+        targets is a list of tuples (flow, file path, map path)
+        If update is True then files are written only if changed
+        Returns list with finished writer for each target
+        """
+        opener = _UpdatedFile if update else (lambda path: open(path, "wb"))
+        stream, provenance = self._rendered_stream()
+        writers = []
+        try:
+            for flow, file_path, map_path in targets:
+                writers.append(_FileWriter(
+                    flow, opener(file_path), self.encoding, self.eol,
+                    opener(map_path)
+                    if map_path is not None and provenance else None,
+                    map_format,
+                ))
+            for line, source, flows in stream:
+                for w in writers:
+                    if self._in_flow(w.flow, flows):
+                        w.add(line, source)
+            for w in writers:
+                w.finish()
+        finally:
+            for w in writers:
+                w.close()
+        return writers
+
+
+class _FileWriter:
+    """
+    Encodes and writes lines into file, sources of lines into map
+    """
+    def __init__(
+            self,
+            flow:str|None,
+            file,
+            encoding:str,
+            eol:str,
+            map_file,
+            map_format:str=C_MAP_JSON,
+    ):
+        self.flow = flow
+        self.map_writer = SourceMapWriter(map_file, map_format) \
+            if map_file is not None else None
+        self.changed = False
+        self._file = file
+        self._map_file = map_file
+        self._encoder = codecs.getincrementalencoder(encoding)()
+        self._eol_str = eol
+        self._eol = None
+        self._finished = False
+
+    def add(self, line:str, source):
+        if self._eol is None:
+            self._file.write(self._encoder.encode(line))
+            self._eol = self._encoder.encode(self._eol_str)
+        else:
+            self._file.write(self._eol + self._encoder.encode(line))
+        if self.map_writer is not None:
+            self.map_writer.add(source)
+
+    def finish(self):
+        self._file.write(self._encoder.encode("", final=True))
+        self._finished = True
+
+    def close(self):
+        updated = [
+            v for v in (self._file, self._map_file)
+            if isinstance(v, _UpdatedFile)
+        ]
+        if not self._finished:
+            for v in updated:
+                v.discard()
+        self._file.close()
+        if self.map_writer is not None:
+            self.map_writer.close()
+        self.changed = any(v.changed for v in updated)
+
+
+class _UpdatedFile:
+    """
+    Binary file that is rewritten only if it's content is changed
+    Written data is compared with content of existing file
+    and nothing is written until first difference is met.
+    Then existing content is copied into temporary file
+    which is put in place of existing file on close
+    NOTE: writes are expected not to overlap
+    """
+    def __init__(self, path:str):
+        self.path = Path(path)
+        self.changed = False
+        self._tmp_path = self.path.with_name(self.path.name + C_TEMP_SUFFIX)
+        self._orig = open(self.path, "rb") if self.path.exists() else None
+        self._tmp = None
+        self._pos = 0
+        self._size = 0
+        self._written = 0
+        self._discard = False
+        self._closed = False
+        if self._orig is None:
+            self._diverge()
+
+    def _diverge(self):
+        """
+        Switch to writing into temporary file
+        All that were written so far is same as existing file's content
+        """
+        self._tmp = open(self._tmp_path, "wb")
+        if self._orig is not None:
+            self._orig.seek(0)
+            shutil.copyfileobj(self._orig, self._tmp)
+            self._orig.close()
+            self._orig = None
+        self._tmp.seek(self._pos)
+        self.changed = True
+
+    def write(self, data:bytes):
+        if self._tmp is None:
+            if self._orig.tell() != self._pos:
+                self._orig.seek(self._pos)
+            if self._orig.read(len(data)) != data:
+                self._diverge()
+        if self._tmp is not None:
+            self._tmp.write(data)
+        self._pos += len(data)
+        self._size = max(self._size, self._pos)
+        self._written += len(data)
+
+    def seek(self, pos:int):
+        self._pos = pos
+        if self._tmp is not None:
+            self._tmp.seek(pos)
+
+    def discard(self):
+        """
+        Drop written content, existing file is kept as is
+        """
+        self._discard = True
+        self.changed = False
+
+    def close(self):
+        """
+        Put written content in place if it differs from existing one
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if self._tmp is None and not self._discard:
+                self._orig.seek(0, os.SEEK_END)
+                if self._orig.tell() != self._size \
+                or self._written != self._size:
+                    self._diverge()
+            if self._tmp is not None:
+                self._tmp.truncate(self._size)
+                self._tmp.close()
+                if not self._discard:
+                    os.replace(self._tmp_path, self.path)
+        finally:
+            if self._orig is not None:
+                self._orig.close()
+            if self._tmp is not None:
+                self._tmp.close()
+                self._tmp_path.unlink(missing_ok=True)
+
 
 class InnerFile(File):
     """
@@ -241,14 +655,145 @@ class OuterFile(File):
 class Files:
     """
     Represents files collection
+    Files are accessed by their output path and kept in order
+    they were added (which is used as build order)
     """
 
-    def __init__(self, files:list[File]):
-        self._files = files
+    def __init__(self, files:list[File]|dict[str:File]):
+        self._files = {}
+        if isinstance(files, dict):
+            files = files.values()
+        for v in files:
+            self.insert(v)
 
     @property
-    def list(self):
-        return self._files
+    def list(self) -> list[File]:
+        return list(self._files.values())
+
+    def iterate(self):
+        """
+        Iterate over files in order they were added
+        """
+        return iter(self._files.values())
+
+    def paths(self):
+        """
+        Output paths of files in order they were added
+        """
+        return list(self._files.keys())
+
+    def get(self, path:str, default=None) -> File|None:
+        return self._files.get(path, default)
+
+    def __contains__(self, path:str) -> bool:
+        return path in self._files
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def insert(self, file:File):
+        """
+        Add new file to the end of collection
+        """
+        if file.path in self._files:
+            raise ValueError(f"File '{file.path}' is already in collection!")
+        self._files[file.path] = file
+
+    def replace(self, file:File):
+        """
+        Replace file with same path, file's position is kept
+        """
+        if file.path not in self._files:
+            raise ValueError(f"File '{file.path}' is not in collection!")
+        self._files[file.path] = file
+
+    def update(self, file:File):
+        """
+        Replace file with same path or add file if there is no such
+        """
+        self._files[file.path] = file
+
+    def remove(self, path:str):
+        if path not in self._files:
+            raise ValueError(f"File '{path}' is not in collection!")
+        del self._files[path]
+
+    def clone(self):
+        """
+        Get copy of files collection
+        Files are cloned, their content is shared until modified
+        """
+        return Files([v.clone() for v in self._files.values()])
+
+
+def _render_snapshot(snapshot:tuple) -> tuple[list,list|None]:
+    """
+    Render file from it's snapshot (see File.render_snapshot)
+    Returns rendered lines, their sources and flows
+    """
+    cls, path, kind, encoding, eol, file_spec, sections_data, vars, context \
+        = snapshot
+    file = cls(path, kind, encoding, eol, file_spec, sections_data, vars)
+    file.render(context)
+    return file.rendered, file.rendered_sources, file.rendered_flows
+
+
+class RenderExecutor:
+    """
+    Renders multiple files concurrently
+    With threads files are rendered in place (renders' caches are reused).
+    With processes files are rendered from picklable snapshots
+    and results are put back into files
+    Results are applied in order of given files
+    """
+    def __init__(self, kind:str=C_THREADS, max_workers:int|None=None):
+        if kind not in (C_THREADS, C_PROCESSES):
+            raise ValueError(f"Unknown render executor kind '{kind}'!")
+        self.kind = kind
+        self.max_workers = max_workers
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.kind == C_THREADS:
+                self._pool = ThreadPoolExecutor(self.max_workers)
+            else:
+                self._pool = ProcessPoolExecutor(self.max_workers)
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def render(self, files:list[File], context:RunContext):
+        """
+        Render files using given context
+        """
+        files = [*files]
+        if len(files) == 0:
+            return
+        if len(files) == 1:
+            files[0].render(context)
+            return
+        pool = self._get_pool()
+        if self.kind == C_THREADS:
+            for _ in pool.map(lambda f: f.render(context), files):
+                pass
+        else:
+            results = pool.map(
+                _render_snapshot, [f.render_snapshot(context) for f in files])
+            for f, rendered in zip(files, results):
+                f.apply_render(context, rendered)
+
+
+def target_path(path:str, kind:str) -> str:
+    """
+    Returns output path of file with given name and kind
+    """
+    if kind not in FILE_FORMATS:
+        raise ValueError(f"No spec for file kind '{kind}' were found!")
+    return path + FILE_FORMATS[kind].ext
 
 
 def default_target(lang:str) -> tuple[str, str]|None:
@@ -1,13 +1,50 @@
 from pathlib import Path
-from copy import deepcopy
+from collections.abc import Sequence
+from collections import OrderedDict
+from itertools import count
+from threading import Lock
 import io
 import json
+import re
 import ruamel.yaml
 yaml = ruamel.yaml.YAML()
-from jinja2.sandbox import SandboxedEnvironment
+from jinja2 import BaseLoader
+from jinja2.sandbox import ImmutableSandboxedEnvironment
 from .literals import *
 from ..helpers import *
 from .context import RunContext, GeneratedLine
+from .persistent import PersistentList
+from .cache import JinjaBytecodeCache
+
+
+# Ids of rendered subsections' parts, unique within process
+_PART_IDS = count()
+
+
+class _SectionLines(Sequence):
+    """
+    Read-only view of section's lines over it's subsections
+    """
+    def __init__(self, parts:list[tuple[str,PersistentList]]):
+        self._parts = parts
+
+    def __len__(self) -> int:
+        return sum(len(lines) for _, lines in self._parts)
+
+    def __iter__(self):
+        for _, lines in self._parts:
+            yield from lines
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return list(self)[idx]
+        if idx < 0:
+            idx += len(self)
+        for _, lines in self._parts:
+            if 0 <= idx < len(lines):
+                return lines[idx]
+            idx -= len(lines)
+        raise IndexError("Section lines index out of range")
 
 
 class _FileRender:
@@ -22,8 +59,16 @@ class _FileRender:
         """
         Reset to defaults internal data
         """
+        self._file = None
+        self._parts = None
+        self._use_cache = True
+        self._provenance = None
         self._prepared_sections = None
         self._prepared_data = None
+        # Per-render data for contexts of lines
+        # NOTE: lines of a tag application share context, so key is context's id
+        # Context is kept in value to make sure id is not reused
+        self._contexts_data = {}
 
     @staticmethod
     def _to_yaml(value, margins:int=0, **kwargs) -> str:
@@ -38,33 +83,95 @@ class _FileRender:
             yaml_lines = "\n".join([margin + l for l in yaml_lines.split("\n")])
         return yaml_lines
 
+    def _render_subsection(
+            self,
+            section_name:str,
+            subsection_name:str,
+            lines:PersistentList,
+    ) -> PersistentList:
+        """
+        Renders lines of single subsection
+        Result of previous render is reused if subsection wasn't modified
+        If lines were only appended since previous render
+        then only appended lines are rendered
+        Rendered lines refer to subsection's lines by part's id (see _render_line)
+        If render's cache is not used then lines that can't be reused
+        are rendered on the fly (generator is returned) and aren't kept
+        """
+        cache = self._file.get_render_cache()
+        key = (section_name, subsection_name)
+        cached = cache.get(key, None)
+        if cached is not None:
+            cached_lines, rendered, part = cached
+            if not self._file.is_dirty(section_name, subsection_name):
+                self._parts[part] = cached_lines
+                return rendered
+            if cached_lines.is_prefix_of(lines):
+                self._parts[part] = lines
+                if len(cached_lines) == len(lines):
+                    return rendered
+                rendered = rendered.fork()
+                for i in range(len(cached_lines), len(lines)):
+                    rendered.append(self._render_line(lines[i], part, i))
+                cache[key] = (lines.fork(), rendered, part)
+                return rendered
+        part = next(_PART_IDS)
+        self._parts[part] = lines
+        if not self._use_cache:
+            # NOTE: outdated entry is dropped as it's not valid after this render
+            cache.pop(key, None)
+            return (self._render_line(line, part, i) for i, line in enumerate(lines))
+        rendered = PersistentList([
+            self._render_line(line, part, i) for i, line in enumerate(lines)])
+        cache[key] = (lines.fork(), rendered, part)
+        return rendered
+
     def _render_section(
             self,
-            sections:dict[str:list[GeneratedLine]],
+            sections:dict[str:list[tuple[str,PersistentList]]],
             section_name:str,
             not_exists_ok:bool=True,
+            margin:str="",
     ) -> str:
         """
         Renders single section of file to a string
         Uses all subsections, sorted by their names, _default_ first
+        Result is reused if rendered subsections are same as on previous render
         """
         if section_name not in sections:
             if not_exists_ok:
                 return ""
             else:
                 raise ValueError(f"Section '{section_name}' is not found!")
-        result = []
-        for line in sections[section_name]:
-            result.append(self._render_line(line))
-        return "\n".join(result)
+        parts = tuple(
+            self._render_subsection(section_name, sub, lines)
+            for sub, lines in sections[section_name]
+        )
+        cache = self._file.get_render_cache()
+        key = (S_SECTION, section_name, margin)
+        cached = cache.get(key, None)
+        if cached is not None \
+        and len(cached[0]) == len(parts) \
+        and all(a is b for a,b in zip(cached[0], parts)):
+            return cached[1]
+        result = "\n".join(line for rendered in parts for line in rendered)
+        if margin != "":
+            result = "\n".join([margin + l for l in result.split("\n")])
+        if self._use_cache:
+            cache[key] = (parts, result)
+        else:
+            cache.pop(key, None)
+        return result
 
     @critical_todo
-    def _prepare(self, file, context:RunContext) -> dict:
+    def _prepare(self, file, context:RunContext, use_cache:bool=True) -> dict:
         """
         Creates sandbox environment for using in renders
+        If use_cache is False then render's cache is not filled with
+        rendered lines (only existing valid entries are reused)
         Environment contains
         - main data to be rendered as
-          dict(sections) of dict(subsections) of list of lines
+          dict(sections) of lists of lines
         - vars as dict
         - attrs as dict
         - helpers
@@ -75,116 +182,521 @@ class _FileRender:
                 [k for k in subsections.keys() if k != C_DEFAULT])
             if C_DEFAULT in subsections:
                 subsections_keys = [C_DEFAULT] + subsections_keys
-            for sub in subsections_keys:
-                for line in subsections[sub]:
-                    if section not in sections:
-                        sections[section] = []
-                    sections[section].append(line)
+            parts = [
+                (sub, subsections[sub]) for sub in subsections_keys
+                if len(subsections[sub]) > 0
+            ]
+            if len(parts) > 0:
+                sections[section] = parts
 
         def render_section(section_name:str, margin:str="", not_exists_ok:bool=True):
-            lines = self._render_section(sections, section_name, not_exists_ok)
-            if margin != "":
-                lines = "\n".join([margin + l for l in lines.split("\n")])
-            return lines
+            return self._render_section(sections, section_name, not_exists_ok, margin)
 
         vars = {**file.vars}
         if S_SUBJECT not in vars:
             vars[S_SUBJECT] = Path(file.path).stem
             # TODO: not so obvious, doc it or remove it!
         data = to_dict(
-            sections = sections,
-            file_vars = EzClass(**deepcopy(vars)),
-            doc_vars  = EzClass(**deepcopy(context.vars.data)),
-            doc_attrs = EzClass(**deepcopy(context.attrs.data)),
+            sections = {k:_SectionLines(v) for k,v in sections.items()},
+            file_vars = ReadOnlyView(vars),
+            doc_vars  = ReadOnlyView(context.vars.data),
+            doc_attrs = ReadOnlyView(context.attrs.data),
             yaml = self._to_yaml,
             json = json.dumps,
             str = str,
             render_section = render_section,
             hasattr = hasattr,
         )
+        self._file = file
+        self._parts = {}
+        self._use_cache = use_cache
+        self._provenance = context.provenance()
         self._prepared_sections = sections
         self._prepared_data     = data
 
-    def _render(self, template:str) -> list[str]:
+    def _iter_section(
+            self,
+            sections:dict[str:list[tuple[str,PersistentList]]],
+            section_name:str,
+            not_exists_ok:bool=True,
+            margin:str="",
+    ):
+        """
+        Same as _render_section but yields text chunks (line by line)
+        instead of producing whole section's text
+        """
+        if section_name not in sections:
+            if not_exists_ok:
+                return
+            else:
+                raise ValueError(f"Section '{section_name}' is not found!")
+        first = True
+        for sub, lines in sections[section_name]:
+            for line in self._render_subsection(section_name, sub, lines):
+                if first:
+                    first = False
+                    yield margin + line
+                else:
+                    yield "\n" + margin + line
+
+    def _render_chunks(self, template:str):
         """
         Exact rendering function
+        Yields chunks of file's text
         """
         raise NotImplementedError(
             "This function should be implemented in derivative class!")
 
-    def _render_line(self, line:GeneratedLine) -> str:
+    @staticmethod
+    def _split_lines(chunks):
+        """
+        Join text chunks and split into lines on the fly
+        """
+        pending = []
+        for chunk in chunks:
+            if "\n" not in chunk:
+                pending.append(chunk)
+                continue
+            parts = chunk.split("\n")
+            pending.append(parts[0])
+            yield "".join(pending)
+            yield from parts[1:-1]
+            pending = [parts[-1]]
+        yield "".join(pending)
+
+    def _context_data(self, context:RunContext, key:str, factory):
+        """
+        Get data, produced by factory for context of lines
+        Data is produced once per render for each context
+        """
+        ctx_id = id(context)
+        if ctx_id not in self._contexts_data:
+            self._contexts_data[ctx_id] = (context, {})
+        data = self._contexts_data[ctx_id][1]
+        if key not in data:
+            data[key] = factory(context)
+        return data[key]
+
+    def _render_line(self, line:GeneratedLine, part:int, idx:int) -> str:
         """
         Single line rendering
+        Line is marked with id of subsection's part and index of line in it,
+        so it's source and flows are taken from subsection's lines
+        NOTE: newlines within line are escaped to keep line solid
         """
-        data = to_dict(
-            line = line.content,
-            source = any_to_dict_list_scalar(line.source),
-            context = any_to_dict_list_scalar(line.context)
-        )
-        return C_RENDER_MAGIC+json.dumps(data, separators=(',', ':'))
+        if line.source is None and line.flows is None:
+            ref = C_NO_SOURCE
+        else:
+            ref = f"{part}:{idx}"
+        content = line.content.replace("\n", C_RENDER_NL)
+        return f"{C_RENDER_MAGIC}{ref} {content}"
+
+    def _extract_source(self, line:str) -> tuple[str, list|None, list|None]:
+        """
+        Remove marks from rendered line
+        Returns pure line, source of line (None for lines of template)
+        and flows of line (None if line is for all flows)
+        If there are multiple marks in line then first mark is used
+        """
+        first = None
+        if C_RENDER_MAGIC in line:
+            while C_RENDER_MAGIC in line:
+                offs = line.index(C_RENDER_MAGIC)
+                end = line.index(" ", offs + len(C_RENDER_MAGIC))
+                if first is None:
+                    first = line[offs + len(C_RENDER_MAGIC):end]
+                line = line[:offs] + line[end+1:]
+            line = line.replace(C_RENDER_NL, "\n")
+        if first is None or first == C_NO_SOURCE:
+            return line, None, None
+        part, idx = first.split(":")
+        source_line = self._parts[int(part)][int(idx)]
+        return line, source_line.source, source_line.flows
+
+    def iter_render(self, file, context:RunContext, use_cache:bool=True):
+        """
+        Render file structured data using provided context
+        Yields final lines with their sources and flows one by one
+        (source is None if line is produced by template or provenance is off,
+        flows are None if line is for all flows)
+        If use_cache is False then rendered lines are not kept in render's
+        cache, so memory is not bound to file's size
+        """
+        self._prepare(file, context, use_cache)
+        try:
+            for line in self._split_lines(
+                    self._render_chunks(file.get_template())):
+                yield self._extract_source(line)
+        finally:
+            self._cleanup()
 
-    def render(self, file, context:RunContext) -> list[str]:
+    def render(self, file, context:RunContext) -> tuple[list[str], list, list]:
         """
         Render file structured data into flat lines using provided context
-        NOTE: rendered lines contains extra info
-        To get final result - use finalize_line for each line
+        Returns lines, table with source of each line
+        (None if line is produced by template) and table with flows of each line
+        Sources table is None if provenance is off
+        Flows table is None if all lines are for all flows
         """
-        self._prepare(file, context)
-        result = self._render(file.get_template())
-        self._cleanup()
-        return result
+        lines = []
+        sources = [] if context.provenance() else None
+        flows = []
+        has_flows = False
+        for line, source, line_flows in self.iter_render(file, context):
+            lines.append(line)
+            if sources is not None:
+                sources.append(source)
+            flows.append(line_flows)
+            has_flows = has_flows or line_flows is not None
+        return lines, sources, flows if has_flows else None
 
-    @critical_todo
-    def finalize_line(self, line:str, flow=None) -> tuple[str, str]|None:
+
+class _SourceLoader(BaseLoader):
+    """
+    Jinja2 loader that uses template's name as template's source
+    Allows to use bytecode cache for templates that are made from strings
+    """
+    def get_source(self, environment, template:str):
+        return template, None, lambda: True
+
+
+class TemplatesCache:
+    """
+    Bounded LRU cache of compiled templates
+    Templates are keyed by their source text
+    Templates are compiled via environment's loader (_SourceLoader) if there
+    is any, so environment's bytecode cache is used for templates of files
+    and lines (bytecode is keyed by hash of template's source)
+    """
+    def __init__(self, env:ImmutableSandboxedEnvironment, max_size:int=4096):
+        self._env = env
+        self._max_size = max_size
+        self._templates = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, source:str):
         """
-        Remove extra info from line
-        Returns pure line and mapping info (with description of line's source)
+        Get compiled template for source, compile it if it's not in cache
         """
-        if C_RENDER_MAGIC not in line:
-            return line, '[["Template"]]'
-        offs = line.index(C_RENDER_MAGIC)
-        data = json.loads(line[offs + len(C_RENDER_MAGIC):])
-        if flow is not None:
-            raise NotImplementedError(
-                "Flow separation is not implemented yet!")
-            # TODO: check flow, skip if line is for different flow
-            return None
-        return \
-            line[:offs] + data['line'], \
-            json.dumps(data['source'], separators=(',', ':')),
+        with self._lock:
+            template = self._templates.get(source, None)
+            if template is not None:
+                self._templates.move_to_end(source)
+                self.hits += 1
+                return template
+            self.misses += 1
+        if self._env.loader is not None:
+            template = self._env.get_template(source)
+        else:
+            template = self._env.from_string(source)
+        with self._lock:
+            self._templates[source] = template
+            while len(self._templates) > self._max_size:
+                self._templates.popitem(last=False)
+        return template
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        return to_dict(
+            hits = self.hits,
+            misses = self.misses,
+            size = len(self._templates),
+            max_size = self._max_size,
+        )
 
 
 class RenderJinja2(_FileRender):
     """
     Renders files using Jinja2
+    Sandboxed environment and compiled templates are shared by all renders
+    NOTE: environment is immutable sandbox, so templates can't modify
+    vars and attrs, which are exposed to templates without copying
     """
+    _jinja = ImmutableSandboxedEnvironment(
+        loader = _SourceLoader(),
+        bytecode_cache = JinjaBytecodeCache(),
+        cache_size = 0,     # NOTE: templates are cached by TemplatesCache
+    )
+    _templates = TemplatesCache(_jinja)
+    _max_line_passes = 16   # Max amount of render passes for single line
 
-    def _render(self, template:str) -> list[str]:
+    @classmethod
+    def templates_stats(cls) -> dict:
+        """
+        Hit/miss counters of compiled templates cache
+        """
+        return cls._templates.stats()
+
+    def _render_chunks(self, template:str):
         """
         Render template using jinja
         """
         if S_RAW in self._prepared_data['sections']:
             template = "{{ render_section('raw') }}"
-        jinja = SandboxedEnvironment()
-        result = jinja.from_string(template).render(**self._prepared_data)
-        result = result.split("\n")
-        return result
+        return self._templates.get(template).generate(**self._prepared_data)
+
+    def _is_plain(self, content:str) -> bool:
+        """
+        Check that line contains no template syntax
+        """
+        env = self._jinja
+        return env.variable_start_string not in content \
+            and env.block_start_string not in content \
+            and env.comment_start_string not in content \
+            and env.line_statement_prefix is None \
+            and env.line_comment_prefix is None \
+            and "\r" not in content
+
+    @staticmethod
+    def _plain_fixed_point(content:str) -> str:
+        """
+        Result of rendering line without template syntax until it's not changed
+        NOTE: each jinja pass drops single trailing newline
+        """
+        return content.rstrip("\n")
 
-    def _render_line(self, line:GeneratedLine) -> str:
+    def _render_line(self, line:GeneratedLine, part:int, idx:int) -> str:
         """
         Preprocess each line using jinja
+        Line is rendered until result is not changed
         Then call original method
         """
         content = line.content
-        prev_content = None
-        jinja = SandboxedEnvironment()  # TODO: use common env for performance?
-        data = to_dict(
-            cell_vars  = EzClass(**deepcopy(line.context.vars.data)),
-            cell_attrs = EzClass(**deepcopy(line.context.attrs.data)),
+        if not self._is_plain(content):
+            data = self._context_data(
+                line.context,
+                "jinja",
+                lambda v: {
+                    **to_dict(
+                        cell_vars  = ReadOnlyView(v.vars.data),
+                        cell_attrs = ReadOnlyView(v.attrs.data),
+                    ),
+                    **self._prepared_data,
+                }
+            )
+            seen = set()
+            for _ in range(self._max_line_passes):
+                prev_content = content
+                content = self._templates.get(prev_content).render(**data)
+                if content == prev_content:
+                    break
+                if self._is_plain(content):
+                    break
+                if content in seen:
+                    raise ValueError(
+                        f"Rendering of line '{line.content}' loops forever!"
+                        f" (source: {line.source})")
+                seen.add(prev_content)
+            else:
+                raise ValueError(
+                    f"Rendering of line '{line.content}' is not finished"
+                    f" after {self._max_line_passes} passes!"
+                    f" (source: {line.source})")
+        content = self._plain_fixed_point(content) \
+            if self._is_plain(content) else content
+        j_line = GeneratedLine(content, line.source, line.context, line.flows)
+        return super(RenderJinja2, self)._render_line(j_line, part, idx)
+
+
+# Kinds of native plan's nodes
+_N_IF       = "if"
+_N_SECTION  = "section"
+_N_TEXT     = "text"
+_N_VAR      = "var"
+_N_YAML     = "yaml"
+
+
+class _NativePlan:
+    """
+    Section-assembly plan, compiled from a template
+    Only restricted subset of Jinja2 syntax is supported:
+    - {{ render_section('name'[, 'margin']) }}
+    - {{ file_vars.name }}, {{ yaml(file_vars.name) }}
+    - {% if 'name' in sections %}, {% if hasattr(file_vars, 'name') %}
+      {% else %}, {% endif %}
+    - whitespace control with '-'
+    Output is same as produced by Jinja2 with default environment options
+    """
+    _TOKENS = re.compile(
+        r"\{\{(-?)(.*?)(-?)\}\}|\{%(-?)(.*?)(-?)%\}|\{#(-?).*?(-?)#\}",
+        re.DOTALL)
+    _STR = r"""(?:'([^']*)'|"([^"]*)")"""
+    _EXPRESSIONS = (
+        (_N_SECTION, re.compile(
+            rf"render_section\(\s*{_STR}\s*(?:,\s*{_STR}\s*)?\)")),
+        (_N_VAR, re.compile(r"file_vars\.(\w+)")),
+        (_N_YAML, re.compile(r"yaml\(\s*file_vars\.(\w+)\s*\)")),
+    )
+    _CONDITIONS = (
+        re.compile(rf"if\s+{_STR}\s+in\s+sections"),
+        re.compile(rf"if\s+hasattr\(\s*file_vars\s*,\s*{_STR}\s*\)"),
+    )
+
+    def __init__(self, template:str):
+        self.template = template
+        self.nodes = self._compile(template)
+
+    @classmethod
+    def _strings(cls, match:re.Match) -> list[str|None]:
+        """
+        Values of string literals matched by _STR groups
+        """
+        groups = match.groups()
+        return [
+            a if a is not None else b
+            for a, b in zip(groups[0::2], groups[1::2])
+        ]
+
+    def _expression(self, text:str) -> tuple:
+        for kind, regex in self._EXPRESSIONS:
+            m = regex.fullmatch(text)
+            if m is not None:
+                if kind == _N_SECTION:
+                    name, margin = self._strings(m)
+                    return (kind, name, margin or "")
+                return (kind, m.group(1))
+        raise ValueError(
+            f"Expression '{text}' is not supported by native render!")
+
+    def _condition(self, text:str) -> tuple:
+        for kind, regex in zip((_N_SECTION, _N_VAR), self._CONDITIONS):
+            m = regex.fullmatch(text)
+            if m is not None:
+                return (kind, self._strings(m)[0])
+        raise ValueError(
+            f"Statement '{text}' is not supported by native render!")
+
+    def _compile(self, template:str) -> list[tuple]:
+        """
+        Convert template into nested list of plan's nodes
+        """
+        # NOTE: single trailing newline is removed, as Jinja2 does by default
+        if template[-2:] == "\r\n":
+            template = template[:-2]
+        elif template[-1:] == "\n":
+            template = template[:-1]
+
+        # Split template into text and tags, apply whitespace control
+        tokens = []
+        offs = 0
+        strip_next = False
+        for m in self._TOKENS.finditer(template):
+            text = template[offs:m.start()]
+            if strip_next:
+                text = text.lstrip()
+            if (m.group(1) or m.group(4) or m.group(7)) == "-":
+                text = text.rstrip()
+            tokens.append((None, text))
+            if m.group(2) is not None:
+                tokens.append(("expression", m.group(2).strip()))
+                strip_next = m.group(3) == "-"
+            elif m.group(5) is not None:
+                tokens.append(("statement", m.group(5).strip()))
+                strip_next = m.group(6) == "-"
+            else:
+                strip_next = m.group(8) == "-"
+            offs = m.end()
+        text = template[offs:]
+        if strip_next:
+            text = text.lstrip()
+        tokens.append((None, text))
+
+        # Build nodes
+        root = []
+        stack = []  # Opened conditions: condition, branches, enclosing nodes
+        nodes = root
+        for kind, text in tokens:
+            if kind is None:
+                if text != "":
+                    nodes.append((_N_TEXT, text))
+            elif kind == "expression":
+                nodes.append(self._expression(text))
+            elif text == "else":
+                if len(stack) == 0 or stack[-1][2] is not None:
+                    raise ValueError("Unexpected 'else' in template!")
+                stack[-1][2] = nodes = []
+            elif text == "endif":
+                if len(stack) == 0:
+                    raise ValueError("Unexpected 'endif' in template!")
+                condition, then_nodes, else_nodes, nodes = stack.pop()
+                nodes.append((_N_IF, condition, then_nodes, else_nodes or []))
+            else:
+                stack.append([self._condition(text), [], None, nodes])
+                nodes = stack[-1][1]
+        if len(stack) > 0:
+            raise ValueError("Missing 'endif' in template!")
+        return root
+
+    def _iter(self, nodes:list[tuple], data:dict, iter_section):
+        for node in nodes:
+            kind = node[0]
+            if kind == _N_TEXT:
+                yield node[1]
+            elif kind == _N_SECTION:
+                yield from iter_section(node[1], node[2])
+            elif kind == _N_VAR:
+                yield str(getattr(data['file_vars'], node[1], ""))
+            elif kind == _N_YAML:
+                yield data['yaml'](getattr(data['file_vars'], node[1]))
+            else:
+                (cond_kind, name), then_nodes, else_nodes = node[1:]
+                if cond_kind == _N_SECTION:
+                    value = name in data['sections']
+                else:
+                    value = hasattr(data['file_vars'], name)
+                yield from self._iter(
+                    (else_nodes, then_nodes)[value], data, iter_section)
+
+    def iter(self, data:dict, iter_section):
+        """
+        Assemble file content using prepared render's data
+        Yields text chunks, sections' chunks are produced by iter_section
+        """
+        return self._iter(self.nodes, data, iter_section)
+
+    def run(self, data:dict) -> str:
+        """
+        Assemble file content using prepared render's data
+        """
+        return "".join(self.iter(
+            data, lambda name, margin: data['render_section'](name, margin)))
+
+
+class RenderNative(RenderJinja2):
+    """
+    Renders files without Jinja2 for templates that are plain
+    concatenations of sections (see _NativePlan for supported syntax)
+    Plans are compiled once per template
+    NOTE: lines of sections are still rendered as in RenderJinja2
+    (Jinja2 is used only for lines with template syntax)
+    """
+    _plans = {}
+    _plans_lock = Lock()
+
+    @classmethod
+    def _plan(cls, template:str) -> _NativePlan:
+        with cls._plans_lock:
+            plan = cls._plans.get(template, None)
+            if plan is None:
+                plan = cls._plans[template] = _NativePlan(template)
+        return plan
+
+    def _render_chunks(self, template:str):
+        """
+        Render template using compiled plan
+        Sections are streamed line by line
+        """
+        sections = self._prepared_sections
+        if S_RAW in sections:
+            return self._iter_section(sections, S_RAW)
+        return self._plan(template).iter(
+            self._prepared_data,
+            lambda name, margin: self._iter_section(sections, name, True, margin),
         )
-        data = {**data, **self._prepared_data}
-        while content != prev_content:
-            prev_content = content
-            content = jinja.from_string(prev_content).render(**data)
-        j_line = GeneratedLine(content, line.source, line.context)
-        return super(RenderJinja2, self)._render_line(j_line)
@@ -1,4 +1,8 @@
+from bisect import bisect_right
+from collections import deque
+from typing import Iterator
 from .literals import *
+from ..helpers import escape_scanner
 from .source_io import SourceText, Line, Fenced
 from .cells import Cell, CellsStream, CodeCell, DocCell
 
@@ -22,6 +26,207 @@ def is_vdf(kind:str|None, content:list[str]|list[Line]) -> bool:
     return False
 
 
+class _Lexer:
+    """
+    Single-pass lexer of source lines into raw cells
+    For each line:
+    1. Multiline code is merged
+    2. Fenced code boundaries are looked up
+    3. Lines and fenced sections are split into raw cells
+    Cells split is detected over a lookahead window of items
+    that is as long as split sequence
+    Lexer's state can be saved and restored, so lexing can be resumed
+    from any line
+    """
+    def __init__(self, source:SourceText):
+        self.source = source
+        self.src = source.source
+        self.cells_split = source.cells_split
+        self.window_size = max(len(self.cells_split), 1)
+        self.scanner = escape_scanner(source.escape_symbol)
+        self.joined = None      # Merged line that is continued: [idx, content]
+        self.join_lines = 0     # If above zero - amount of chars to drop before joining following line
+        self.fenced = None      # Fenced section that is not closed yet: (idx, end, kind, lines)
+        self.window = deque()   # Items, not yet assigned to a cell: tuples (stripped line or None, Line|Fenced)
+        self.cell_data = []     # Accumulated content for a single cell as a list
+        self.split_skip = 0
+        self.ready = []         # Complete cells, not yet taken
+
+    def state(self) -> tuple:
+        """
+        Copy of lexer's state
+        """
+        return (
+            None if self.joined is None else [*self.joined],
+            self.join_lines,
+            None if self.fenced is None else (*self.fenced[:3], [*self.fenced[3]]),
+            [*self.window],
+            [*self.cell_data],
+            self.split_skip,
+        )
+
+    def restore(self, state:tuple):
+        """
+        Restore lexer's state from a copy
+        """
+        joined, self.join_lines, fenced, window, cell_data, self.split_skip = state
+        self.joined = None if joined is None else [*joined]
+        self.fenced = None if fenced is None else (*fenced[:3], [*fenced[3]])
+        self.window = deque(window)
+        self.cell_data = [*cell_data]
+        self.ready = []
+
+    def take(self) -> list[Cell]:
+        """
+        Take complete cells
+        """
+        result = self.ready
+        self.ready = []
+        return result
+
+    def _split_ahead(self) -> bool:
+        if len(self.window) < len(self.cells_split):
+            return False
+        for (stripped, _), v in zip(self.window, self.cells_split):
+            if stripped is None or stripped != v:
+                return False
+        return True
+
+    def _step3(self):
+        # Check if sequence, starting from first item of window, is cells split
+        if self._split_ahead():
+            # Put accumulated into cells list, start new cell
+            if len(self.cell_data) > 0:
+                cell_source = self.cell_data[0].source
+            else:
+                cell_source = self.window[0][1].source
+            self.ready.append(Cell(self.cell_data, cell_source))
+            self.cell_data = []
+            self.split_skip = len(self.cells_split) - 1
+            self.window.popleft()
+            return
+        _, item = self.window.popleft()
+        # If part of split sequence should be skipped - skip it
+        if self.split_skip > 0:
+            self.split_skip -= 1
+            return
+        # Accumulate data for next cell
+        self.cell_data.append(item)
+
+    def _push(self, stripped:str|None, item:Line|Fenced):
+        self.window.append((stripped, item))
+        if len(self.window) >= self.window_size:
+            self._step3()
+
+    def _step2(self, idx:int, line:str):
+        stripped = line.strip()
+        if self.fenced is None:
+            # If fenced section hasn't started yet
+            fenced_end, fenced_kind = self.source.fenced_check(stripped)
+            if fenced_end is None:
+                self._push(stripped, Line(idx, line, self.src))
+            else:
+                self.fenced = (idx, fenced_end, fenced_kind, [Line(idx, line, self.src)])
+        else:
+            # If inside fenced section
+            self.fenced[3].append(Line(idx, line, self.src))
+            if stripped == self.fenced[1]:
+                fenced_idx, _, fenced_kind, fenced_lines = self.fenced
+                self.fenced = None
+                self._push(None, Fenced(fenced_idx, fenced_kind, fenced_lines, self.src))
+
+    def feed(self, idx:int, line:str):
+        """
+        Lex next line
+        """
+        if self.join_lines > 0:
+            self.joined[1] = self.joined[1][:-self.join_lines] + line
+            self.join_lines = 0
+        else:
+            self.joined = [idx, line]
+
+        # Line is continued if it ends with unescaped continuation sequence
+        if line[-2:] == "\\\n" and not self.scanner.any_escaped(line, -2):
+            self.join_lines = 2
+        if line[-3:] in ("\\\r\n", "\\\n\r") and not self.scanner.any_escaped(line, -3):
+            self.join_lines = 3
+
+        if self.join_lines == 0:
+            joined, self.joined = self.joined, None
+            self._step2(*joined)
+
+    def finish(self):
+        """
+        Complete lexing after last line
+        """
+        if self.joined is not None:
+            joined, self.joined = self.joined, None
+            self.join_lines = 0
+            self._step2(*joined)
+        if self.fenced is not None:
+            # Last fenced section
+            fenced_idx, _, fenced_kind, fenced_lines = self.fenced
+            self.fenced = None
+            self._push(None, Fenced(fenced_idx, fenced_kind, fenced_lines, self.src))
+        while len(self.window) > 0:
+            self._step3()
+        if len(self.cell_data) > 0:
+            # Last cell
+            self.ready.append(Cell(self.cell_data, self.cell_data[0].source))
+            self.cell_data = []
+
+
+def _item_key(item:Line|Fenced, delta:int) -> tuple:
+    """
+    Comparable representation of lexed item, with line indexes shifted back by delta
+    """
+    if isinstance(item, Line):
+        return (item.idx - delta, item.content)
+    return (item.idx - delta, item.kind, tuple(_item_key(v, delta) for v in item.content))
+
+
+def _cell_key(cell:Cell, delta:int=0) -> tuple:
+    """
+    Comparable representation of raw cell, with line indexes shifted back by delta
+    """
+    location = cell.location
+    if len(location) > 0 and isinstance(location[-1], int):
+        location[-1] -= delta
+    return (tuple(location), tuple(_item_key(v, delta) for v in cell.content))
+
+
+def _state_key(state:tuple, delta:int) -> tuple:
+    """
+    Comparable representation of lexer's state, with line indexes shifted back by delta
+    """
+    joined, join_lines, fenced, window, cell_data, split_skip = state
+    return (
+        None if joined is None else (joined[0] - delta, joined[1]),
+        join_lines,
+        None if fenced is None else (
+            fenced[0] - delta, *fenced[1:3], tuple(_item_key(v, delta) for v in fenced[3])),
+        tuple((v[0], _item_key(v[1], delta)) for v in window),
+        tuple(_item_key(v, delta) for v in cell_data),
+        split_skip,
+    )
+
+
+def _shift_state(state:tuple, delta:int) -> tuple:
+    """
+    Lexer's state with line indexes shifted by delta
+    """
+    joined, join_lines, fenced, window, cell_data, split_skip = state
+    return (
+        None if joined is None else [joined[0] + delta, joined[1]],
+        join_lines,
+        None if fenced is None else (
+            fenced[0] + delta, *fenced[1:3], [v.shifted(delta) for v in fenced[3]]),
+        [(v[0], v[1].shifted(delta)) for v in window],
+        [v.shifted(delta) for v in cell_data],
+        split_skip,
+    )
+
+
 class RawDocument:
     """
     Class for raw source document representation and handling
@@ -31,6 +236,9 @@ class RawDocument:
             autoparse:bool=True
     ):
         self.autoparse = autoparse
+        self._raw_cells = None  # Raw cells of parsed source
+        self._raw_parsed = None # Doc/Code cells of each raw cell (None if not parsed yet)
+        self._snapshots = None  # Lexer's states: tuples (line, state before line, amount of raw cells before line)
         self.source = source
         if not self.autoparse:
             self.cells = None
@@ -44,6 +252,9 @@ class RawDocument:
     def source(self, value:SourceText):
         self._source = value
         self.cells = None
+        self._raw_cells = None
+        self._raw_parsed = None
+        self._snapshots = None
         if self.autoparse:
             self.parse()
 
@@ -52,124 +263,21 @@ class RawDocument:
         Parse source into cells stream
         Returns CellsStream
         """
+        return CellsStream(list(self.iter_raw_cells(source)))
 
-        # What to do:
-        # 1. Merge multiline code
-        # 2. Lookup for fenced code boundaries
-        # 3. Split into raw cells
-
-        ## Step 1.
-        step1 = []      # Lines are merged
-        join_lines = 0  # If above zero - amount of chars to drop before joining following line
+    def iter_raw_cells(self, source:SourceText) -> Iterator[Cell]:
+        """
+        Parse source into raw cells in a single pass
+        Multiline code is merged, fenced sections are detected and cells are
+        split as lines are read, so each cell is yielded as soon as it's complete
+        """
+        lexer = _Lexer(source)
         for idx, line in source.lines:
-            if join_lines > 0:
-                step1[-1][1] = step1[-1][1][:-join_lines] + line
-                join_lines = 0
-            else:
-                step1.append([idx, line,])
-                idx +=1
-            tmp = source.replace_escaped(line, '~')
-
-            if tmp[-2:] == "\\\n":
-                join_lines = 2
-            if tmp[-3:] == "\\\r\n":
-                join_lines = 3
-            if tmp[-3:] == "\\\n\r":
-                join_lines = 3
-
-
-        ## Step 2.
-        step2 = []  # list with Lines and Fenced sections
-        fenced_idx = None
-        fenced_end = None
-        fenced_kind = None
-        fenced_lines = []
-        for idx, line in step1:
-            if fenced_end is None:
-                # If fenced section hasn't started yet
-                fenced_end, fenced_kind = source.fenced_check(line.strip())
-                if fenced_end is None:
-                    step2.append((idx, line, Line(idx, line, source.source)))
-                    continue
-                else:
-                    fenced_idx = idx
-                    fenced_lines.append(Line(idx,line, source.source))
-            else:
-                # If inside fenced section
-                fenced_lines.append(Line(idx,line, source.source))
-                if line.strip() == fenced_end:
-                    step2.append((
-                        idx,
-                        None,
-                        Fenced(
-                            fenced_idx,
-                            fenced_kind,
-                            fenced_lines,
-                            source.source
-                        ),
-                    ))
-                    fenced_idx = None
-                    fenced_end = None
-                    fenced_kind = None
-                    fenced_lines = []
-        if len(fenced_lines) > 0:
-            # Last fenced section
-            step2.append((
-                idx,
-                None,
-                Fenced(
-                    fenced_idx,
-                    fenced_kind,
-                    fenced_lines,
-                    source.source
-                ),
-            ))
-
-        # Step 3.
-        step3 = []      # List of cells' content. Each item contains list of Lines and Fenced sections, related to a cell
-        cell_data =  [] # Accumulated content for a single cell as a list
-        i = -1
-        split_ahead, split_skip = False, 0
-        raw_lines = [v[1] for v in step2]
-        while i < len(step2)-1:
-            i += 1
-
-            # Check if following sequence is cells split
-            split_ahead, next_split_skip = source.split_ahead(raw_lines, i)
-            if split_ahead:
-                # Put accumulated into cells list, start new cell
-                if len(cell_data) > 0:
-                    cell_source = cell_data[0].source
-                else:
-                    cell_source = step2[i][2].source
-                step3.append((cell_data, cell_source))
-                cell_data = []
-                split_skip = next_split_skip - 1
-                continue
-
-            # If part of split sequence should be skipped - skip it
-            if split_skip > 0:
-                split_skip -= 1
-                continue
-
-            # Accumulate data for next cell
-            cell_data.append(step2[i][2])
-
-        if len(cell_data) > 0:
-            # Last cell
-            step3.append((cell_data, cell_data[0].source))
-            cell_data = []
-
-        cells = []
-        for cell_data, cell_source in step3:
-            cells.append(Cell(
-                cell_data,
-                cell_source,
-            ))
-
-        result = CellsStream(cells)
-
-        return result
+            lexer.feed(idx, line)
+            if len(lexer.ready) > 0:
+                yield from lexer.take()
+        lexer.finish()
+        yield from lexer.take()
 
     def raw_cells_stream_preprocess(
             self,
@@ -183,28 +291,39 @@ class RawDocument:
 
         result_cells = []
         raw_cells = raw_cells_stream.cells
-        frontmatter = None
+        frontmatter = self.raw_cells_frontmatter(raw_cells)
+        if frontmatter is not None:
+            raw_cells = raw_cells[1:]
+
+        for cell in raw_cells:
+            result_cells += self.raw_cell_preprocess(cell)
+
+        result = CellsStream(result_cells)
+        return result, frontmatter
 
+    def raw_cells_frontmatter(self, raw_cells:list[Cell]) -> Cell|None:
+        """
+        Get frontmatter from raw cells, None if there is no frontmatter
+        """
         if self.source.frontmatter and len(raw_cells) > 1:
             if len(raw_cells[0].content) > 0 \
             and isinstance(raw_cells[0].content[0], Line) \
             and raw_cells[0].content[0].content.strip() == "---":
-                frontmatter = raw_cells[0]
-                raw_cells = raw_cells[1:]
-
-        for cell in raw_cells:
-            stripped_cell_content = [
-                v for v in cell.content
-                if not isinstance(v, Line)
-                or len(v.content.strip()) > 0
-            ]
-            if len(stripped_cell_content) == 1 and isinstance(stripped_cell_content[0], Fenced):
-                result_cells.append(CodeCell(stripped_cell_content, cell.location)) # TODO: wtf this for? , name=cell.name))
-            else:
-                result_cells += self.raw_cell_process(cell)
+                return raw_cells[0]
+        return None
 
-        result = CellsStream(result_cells)
-        return result, frontmatter
+    def raw_cell_preprocess(self, cell:Cell) -> list[DocCell|CodeCell]:
+        """
+        Parse raw cell (that is not a frontmatter) into list of Doc/Code cells
+        """
+        stripped_cell_content = [
+            v for v in cell.content
+            if not isinstance(v, Line)
+            or len(v.content.strip()) > 0
+        ]
+        if len(stripped_cell_content) == 1 and isinstance(stripped_cell_content[0], Fenced):
+            return [CodeCell(stripped_cell_content, cell.location)] # TODO: wtf this for? , name=cell.name))
+        return self.raw_cell_process(cell)
 
     def raw_cell_process(self, cell:Cell) -> list[DocCell|CodeCell]:
         """
@@ -236,8 +355,162 @@ class RawDocument:
         Parse attached source into internal objects (cells and frontmatter)
         Result data is saved internally
         """
-        raw_cells = self.lines_to_raw_cells_stream(self.source)
-        self.cells, self.frontmatter = self.raw_cells_stream_preprocess(raw_cells)
+        lexer = _Lexer(self.source)
+        self._raw_cells = []
+        self._raw_parsed = []
+        self._snapshots = [(0, lexer.state(), 0)]
+        try:
+            self._lex(lexer, 0)
+        finally:
+            # Source's lines are not read till next parse
+            self.source.close()
+        self._update_cells()
+
+    def reparse(self, source:SourceText, start:int, end:int, new_end:int):
+        """
+        Parse source after edit incrementally
+        Edit is that lines from start to end (exclusive) of attached source
+        are replaced with lines from start to new_end (exclusive) of new source
+        Lexing is resumed from the last cell boundary before the edit and
+        stopped as soon as lexer's state after the edit is same as before.
+        Cells before the edit are reused as is, cells after the edit are reused
+        as is if amount of lines is same, otherwise they are shifted copies
+        with same hash
+        """
+        if self._snapshots is None:
+            self._source = source
+            self.parse()
+            return
+
+        delta = new_end - end
+        k = bisect_right(self._snapshots, start, key=lambda v: v[0]) - 1
+        line, state, count = self._snapshots[k]
+        old_raw_cells, old_raw_parsed = self._raw_cells, self._raw_parsed
+        old_snapshots = {v[0]: v for v in self._snapshots[k+1:] if v[0] >= end}
+        old_tail = self._snapshots[k+1:]
+
+        self._source = source
+        self._raw_cells = old_raw_cells[:count]
+        self._raw_parsed = old_raw_parsed[:count]
+        self._snapshots = self._snapshots[:k+1]
+
+        def converged(line:int, state:tuple) -> bool:
+            if line < new_end or line - delta not in old_snapshots:
+                return False
+            return _state_key(state, delta) == _state_key(old_snapshots[line - delta][1], 0)
+
+        lexer = _Lexer(source)
+        lexer.restore(state)
+        try:
+            line = self._lex(lexer, line, converged)
+        finally:
+            # Source's lines are not read till next parse
+            self.source.close()
+
+        # Relexed cells that are same as before (i.e. cells before the edit) are reused
+        head = min(len(self._raw_cells), len(old_raw_cells))
+        for i in range(count, head):
+            if _cell_key(self._raw_cells[i]) != _cell_key(old_raw_cells[i]):
+                head = i
+                break
+            self._raw_cells[i] = old_raw_cells[i]
+            self._raw_parsed[i] = old_raw_parsed[i]
+
+        if line is None:
+            # Lexing haven't converged till the end of source
+            # so relexed cells at the end that are same as before
+            # but shifted by the edit are reused too
+            old_stop = len(old_raw_cells)
+            tail = min(len(self._raw_cells), len(old_raw_cells)) - head
+            for i in range(1, tail + 1):
+                if _cell_key(self._raw_cells[-i], delta) != _cell_key(old_raw_cells[-i]):
+                    break
+                old_stop -= 1
+                if delta == 0:
+                    self._raw_cells[-i] = old_raw_cells[-i]
+                    self._raw_parsed[-i] = old_raw_parsed[-i]
+                elif old_raw_parsed[-i] is not None:
+                    self._raw_parsed[-i] = [c.shifted(delta) for c in old_raw_parsed[-i]]
+
+        if line is not None:
+            # Rest of cells are same as before the edit
+            _, _, old_count = old_snapshots[line - delta]
+            old_stop = old_count
+            count = len(self._raw_cells)
+            if delta == 0:
+                self._raw_cells += old_raw_cells[old_count:]
+                self._raw_parsed += old_raw_parsed[old_count:]
+            else:
+                self._raw_cells += [v.shifted(delta) for v in old_raw_cells[old_count:]]
+                self._raw_parsed += [
+                    None if v is None else [c.shifted(delta) for c in v]
+                    for v in old_raw_parsed[old_count:]
+                ]
+            for old_line, old_state, old_cells in old_tail:
+                if old_line > line - delta:
+                    self._snapshots.append((
+                        old_line + delta,
+                        old_state if delta == 0 else _shift_state(old_state, delta),
+                        old_cells - old_count + count,
+                    ))
+
+        # Doc/code cells of relexed raw cells that are same as before
+        # (i.e. code cell next to edited text) are reused too
+        reuse = {
+            (type(c), _cell_key(c)): c
+            for v in old_raw_parsed[head:old_stop] if v is not None for c in v
+        }
+        self._update_cells(reuse)
+
+    def _lex(self, lexer:_Lexer, start:int, stop=None) -> int|None:
+        """
+        Lex lines of attached source from start, collecting raw cells
+        and lexer's states at cells boundaries (at most one per C_REPARSE_STEP lines)
+        stop(line, state) is checked at each cells boundary. If it's True,
+        lexing is stopped and line is returned. Otherwise None is returned
+        """
+        lines = self.source.lines
+        for idx in range(start, len(lines)):
+            if len(lexer.ready) > 0:
+                cells = lexer.take()
+                self._raw_cells += cells
+                self._raw_parsed += [None] * len(cells)
+                keep = idx - self._snapshots[-1][0] >= C_REPARSE_STEP
+                if keep or stop is not None:
+                    state = lexer.state()
+                    if stop is not None and stop(idx, state):
+                        self._snapshots.append((idx, state, len(self._raw_cells)))
+                        return idx
+                    if keep:
+                        self._snapshots.append((idx, state, len(self._raw_cells)))
+            lexer.feed(*lines[idx])
+        lexer.finish()
+        cells = lexer.take()
+        self._raw_cells += cells
+        self._raw_parsed += [None] * len(cells)
+        return None
+
+    def _update_cells(self, reuse:dict|None=None):
+        """
+        Produce cells and frontmatter from raw cells
+        Raw cells that were parsed before are not parsed again
+        Parsed cells that are found in reuse (by type and key) are replaced
+        with previously parsed ones
+        """
+        self.frontmatter = self.raw_cells_frontmatter(self._raw_cells)
+        result_cells = []
+        for i, cell in enumerate(self._raw_cells):
+            if i == 0 and self.frontmatter is not None:
+                continue
+            if self._raw_parsed[i] is None:
+                self._raw_parsed[i] = self.raw_cell_preprocess(cell)
+                if reuse:
+                    self._raw_parsed[i] = [
+                        reuse.get((type(v), _cell_key(v)), v)
+                        for v in self._raw_parsed[i]
+                    ]
+            result_cells += self._raw_parsed[i]
+        self.cells = CellsStream(result_cells)
 
     @staticmethod
     def parse_code_content(first_line:str, content:str) -> CodeCell:
@@ -18,6 +18,7 @@ S_EXT           = "ext"
 S_FENCED        = "fenced"
 S_FENCED_REGEX  = "fenced_regex"
 S_FENCED_SEQ    = "fenced_seq"
+S_FLOW          = "flow"
 S_KIND          = "kind"
 S_LINE          = "line"
 S_LINES         = "lines"
@@ -30,6 +31,7 @@ S_NEW           = "new"
 S_PARENT        = "parent"
 S_POLL_PERIOD   = "poll_period"
 S_PROCESSOR     = "processor"
+S_PROVENANCE    = "provenance"
 S_RAW           = "raw"
 S_RENDER        = "render"
 S_RUN           = "run"
@@ -61,13 +63,27 @@ C_EXCEPTION     = "__exception__"
 C_FALLBACK      = "__fallback__"
 C_FALLBACK_VDF_VER = "1.0"
 C_MAIN          = "__main__"
+C_MANIFEST      = ".vdf_manifest.json"
+C_MAP_BINARY    = "binary"
+C_MAP_JSON      = "json"
+C_MAPPED_SIZE   = 4 * 1024 * 1024   # Min size of source file that is mapped into memory instead of reading
+C_NO_SOURCE     = "-"
 C_PREFIX        = "__prefix__"
+C_PROCESSES     = "processes"
 C_RENDER_MAGIC  = "%%vdf-render-magic "
+C_RENDER_NL     = "\x00"
+C_REPARSE_STEP  = 64    # Min amount of lines between lexer's states, kept for incremental reparse
 C_ROOT          = "__root__"
+C_TEMP_SUFFIX   = ".vdf_tmp"
+C_THREADS       = "threads"
 C_VOID          = "__void__"
 C_VDF_PREAMBLE  = "%%vdf "
 
 C_BUILD_PATH    = ".build"
+
+C_CACHE_DIR_ENV = "VDF_CACHE_DIR"
+C_CACHE_JINJA   = "jinja"
+C_CACHE_MAX_SIZE= 256 * 1024 * 1024
 C_BUILD_SPEC    = "build_spec.yaml"
 
 C_RUN_PATH      = ".build"  # NOTE: it's not an error, it's done by intention (due to complicated things)
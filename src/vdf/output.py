@@ -1,3 +1,8 @@
+import os
+import json
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from .literals import *
 from ..helpers import *
 
 
@@ -17,3 +22,108 @@ class VdfOutput:
     @not_implemented
     def __init__(self):
         pass
+
+
+class SaveManager:
+    """
+    Saves files into output directory
+    Paths of saved files are kept in manifest within output directory
+    Files (and their maps) are compared with existing ones while written
+    and are rewritten only if their content were changed
+    so unchanged files aren't touched and their modification times are kept
+    Files that were saved previously but are absent now are removed
+    Other content of output directory isn't touched
+    """
+    def __init__(
+            self,
+            output_path:str,
+            save_map:bool=True,
+            map_format:str=C_MAP_JSON,
+            max_workers:int|None=None,
+    ):
+        self.output_path = Path(output_path)
+        self.save_map = save_map
+        self.map_format = map_format
+        self.max_workers = max_workers
+
+    def _load_manifest(self) -> dict:
+        path = self.output_path / C_MANIFEST
+        if not path.exists():
+            return {}
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # NOTE: broken manifest means that stale files aren't removed
+            return {}
+
+    def _save_manifest(self, manifest:dict):
+        path = self.output_path / C_MANIFEST
+        tmp_path = path.with_name(path.name + C_TEMP_SUFFIX)
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def _prune(self, path:Path):
+        """
+        Remove empty directories from path up to output directory
+        """
+        while path != self.output_path and self.output_path in path.parents:
+            try:
+                path.rmdir()
+            except OSError:
+                # NOTE: directory isn't empty
+                return
+            path = path.parent
+
+    def _save_file(self, file, flow) -> tuple[dict, bool]:
+        """
+        Save single file and it's map
+        Returns manifest's entry for file and whether anything were written
+        """
+        file_path = self.output_path / file.path
+        map_path = self.output_path / f"{file.path}.map"
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        has_map, written = file.update(
+            file_path,
+            map_path if self.save_map else None,
+            flow,
+            self.map_format,
+        )
+        if not has_map and map_path.exists():
+            map_path.unlink()
+            written = True
+        return to_dict(map = has_map), written
+
+    def save(self, files, flow=None) -> dict[str:bool]:
+        """
+        Save files (iterable of File) into output directory
+        Writes are done in parallel
+        Returns dict of saved files' paths with value True if file
+        (or it's map) were written and False if it wasn't changed
+        """
+        files = [*files]
+        paths = [f.path for f in files]
+        if len(set(paths)) != len(paths):
+            raise ValueError("Files with same path are given to save!")
+        self.output_path.mkdir(parents=True, exist_ok=True)
+        manifest = self._load_manifest()
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            results = list(pool.map(
+                lambda f: self._save_file(f, flow),
+                files))
+
+        # Remove files that were saved previously but are absent now
+        for path in manifest:
+            if path in paths:
+                continue
+            for v in (path, f"{path}.map"):
+                (self.output_path / v).unlink(missing_ok=True)
+            self._prune((self.output_path / path).parent)
+
+        new_manifest = {
+            path: entry for path, (entry, _) in zip(paths, results)
+        }
+        if new_manifest != manifest:
+            self._save_manifest(new_manifest)
+        return {path: written for path, (_, written) in zip(paths, results)}
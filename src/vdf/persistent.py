@@ -0,0 +1,153 @@
+# Append-only persistent containers
+# Forks are O(1) and share all existing items with their origin
+
+
+class PersistentList:
+    """
+    Append-only list with O(1) forks
+    Forks share items storage. Storage is copied only when fork appends
+    after another fork already appended into the same storage
+    """
+    __slots__ = ("_items", "_len")
+
+    def __init__(self, items:list|None=None):
+        self._items = [*items] if items is not None else []
+        self._len = len(self._items)
+
+    def fork(self):
+        """
+        Make a snapshot of list. Appends to snapshot or to self are not
+        visible to each other
+        """
+        result = PersistentList.__new__(PersistentList)
+        result._items = self._items
+        result._len = self._len
+        return result
+
+    def _own(self):
+        """
+        Make sure that storage can be appended without harm to other forks
+        """
+        if len(self._items) != self._len:
+            self._items = self._items[:self._len]
+
+    def append(self, item):
+        self._own()
+        self._items.append(item)
+        self._len += 1
+
+    def extend(self, items):
+        self._own()
+        self._items.extend(items)
+        self._len = len(self._items)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def is_prefix_of(self, other) -> bool:
+        """
+        Check that items of self are first items of other
+        NOTE: check is done by shared storage, so it's O(1)
+        but it's False for lists with equal items in different storages
+        """
+        return self._items is other._items and self._len <= other._len
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return self._items[slice(*idx.indices(self._len))]
+        if idx < 0:
+            idx += self._len
+        if idx < 0 or idx >= self._len:
+            raise IndexError("PersistentList index out of range")
+        return self._items[idx]
+
+    def __iter__(self):
+        items = self._items
+        for i in range(self._len):
+            yield items[i]
+
+
+class _MultiMapStore:
+    """
+    Storage for PersistentMultiMap, shared between forks
+    """
+    def __init__(self):
+        self.log = []   # Tuples of key and value in order of addition
+        self.keys = {}  # Key to list of positions in log (ascending)
+
+    def truncated(self, length:int):
+        result = _MultiMapStore()
+        for key, value in self.log[:length]:
+            result.add(key, value)
+        return result
+
+    def add(self, key, value):
+        if key not in self.keys:
+            self.keys[key] = []
+        self.keys[key].append(len(self.log))
+        self.log.append((key, value))
+
+
+class PersistentMultiMap:
+    """
+    Append-only multimap (each key may have multiple values) with O(1) forks
+    Values of a key are kept in order of addition
+    """
+    __slots__ = ("_store", "_len")
+
+    def __init__(self):
+        self._store = _MultiMapStore()
+        self._len = 0
+
+    def fork(self):
+        """
+        Make a snapshot of map. Additions to snapshot or to self are not
+        visible to each other
+        """
+        result = PersistentMultiMap.__new__(PersistentMultiMap)
+        result._store = self._store
+        result._len = self._len
+        return result
+
+    def add(self, key, value):
+        if len(self._store.log) != self._len:
+            self._store = self._store.truncated(self._len)
+        self._store.add(key, value)
+        self._len += 1
+
+    def first(self, key, default=None):
+        """
+        Get first value that were added for key
+        """
+        positions = self._store.keys.get(key, None)
+        if not positions or positions[0] >= self._len:
+            return default
+        return self._store.log[positions[0]][1]
+
+    def all(self, key) -> list:
+        """
+        Get all values that were added for key
+        """
+        result = []
+        for pos in self._store.keys.get(key, ()):
+            if pos >= self._len:
+                break
+            result.append(self._store.log[pos][1])
+        return result
+
+    def keys(self) -> list:
+        """
+        Get all keys in order of their first addition
+        """
+        result = []
+        for key, positions in self._store.keys.items():
+            if positions[0] < self._len:
+                result.append(key)
+        return result
+
+    def __contains__(self, key) -> bool:
+        positions = self._store.keys.get(key, None)
+        return bool(positions) and positions[0] < self._len
+
+    def __len__(self) -> int:
+        return self._len
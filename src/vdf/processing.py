@@ -1,6 +1,5 @@
 import ruamel.yaml
 yaml = ruamel.yaml.YAML()
-from copy import deepcopy
 
 from .literals import *
 from ..helpers import *
@@ -10,6 +9,7 @@ from .input import RawDocument, is_vdf
 from .document import Document, Episode
 from .tags import TAG_DEFS, TagsInstances
 from .tags_phases import TAG_PHASES_ORDER
+from .files import RenderExecutor
 
 
 class VdfProcessor:
@@ -18,6 +18,21 @@ class VdfProcessor:
     """
     # TODO: init section with defines to processor (if necessary)
 
+    def __init__(
+            self,
+            lazy_render:bool=False,
+            provenance:bool|None=None,
+            render_executor:RenderExecutor|None=None,
+    ):
+        # If True then files are not rendered while cells are processed
+        # Rendering is done when file's output is required
+        self.lazy_render = lazy_render
+        # If False then sources of generated lines aren't tracked
+        # and source maps aren't produced. Overrides frontmatter's attr
+        self.provenance = provenance
+        # If set then files are rendered concurrently with executor
+        self.render_executor = render_executor
+
     @critical_todo
     def process_cell(
         self,
@@ -122,7 +137,7 @@ class VdfProcessor:
         cell_name = t_name or cell.name
 
         # Check that name is unique
-        if cell_name in d.named_episodes():
+        if d.is_name_taken(cell_name):
             raise ValueError(f"Cell name '{cell_name}' were already taken!")
 
         # Lookup parent if there is any
@@ -157,7 +172,7 @@ class VdfProcessor:
         else:
             context = parent.cell.output_context
 
-        cell_context = deepcopy(context)
+        cell_context = context.snapshot()
 
         # Prepare cell for processing
         # - inherit source info from input cell
@@ -181,8 +196,18 @@ class VdfProcessor:
 
         # 8. Update produced files
         # (in output_cell.context)
-        for f in output_cell.output_context.files.list:
-            f.render(output_cell.run_context)
+        # (only files that were modified or which context were changed)
+        to_render = []
+        for f in output_cell.output_context.files.iterate():
+            if self.lazy_render:
+                f.render(output_cell.run_context, lazy=True)
+            elif f.needs_render(output_cell.run_context):
+                to_render.append(f)
+        if self.render_executor is not None:
+            self.render_executor.render(to_render, output_cell.run_context)
+        else:
+            for f in to_render:
+                f.render(output_cell.run_context)
 
         # 9. Put result into branch
         # (in d)
@@ -222,7 +247,8 @@ class VdfProcessor:
         """
         # Don't touch original document - always add a layer
         _orig = document
-        document = Document(_orig.source, _orig.frontmatter, _orig.root_context)
+        document = Document(
+            _orig.source, _orig.frontmatter, _orig.root_context.snapshot())
 
         root_context = document.root_context
 
@@ -257,6 +283,9 @@ class VdfProcessor:
             if S_VER in frontmatter:
                 root_context.vdf_ver = frontmatter[S_VER]
 
+        if self.provenance is not None:
+            root_context.attrs.data[S_PROVENANCE] = self.provenance
+
         return document
 
     def process_doc(
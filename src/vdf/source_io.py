@@ -1,4 +1,8 @@
+import os
 import re
+import mmap
+from array import array
+from collections.abc import Sequence
 from pathlib import Path
 from .literals import *
 from ..helpers import *
@@ -30,13 +34,133 @@ class SourceReader:
     """
 
 
+class MappedLines(Sequence):
+    """
+    Lines of text file that is mapped into memory
+    Items are same as SourceText's lines - tuples of line index and content
+    (content is without CR and with LF at the end)
+    Offsets of lines are indexed lazily, lines are decoded on demand
+    File is mapped on first access and is re-mapped if it were changed
+    since then (size, modification time or inode differs)
+    Use close() to release mapping when lines are not read for a while
+    NOTE: lines are split by LF byte, so encodings should be ASCII-compatible
+    NOTE: file shouldn't be changed while lines are being read
+    """
+    def __init__(self, path:str, encodings:list[str]=SOURCE_ENCODING):
+        self.path = Path(path)
+        self._encodings = [*encodings]
+        self._data = None   # Mapped data, None if not mapped
+        self._stat = None   # File's size, modification time and inode at mapping time
+        self._starts = None # Offsets of indexed lines
+        self._complete = False  # All lines are indexed
+
+    def _file_stat(self) -> tuple[int, int, int]:
+        stat = os.stat(self.path)
+        return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+    def _map(self):
+        """
+        Make sure that actual file's content is mapped
+        """
+        stat = self._file_stat()
+        if self._data is not None and stat == self._stat:
+            return
+        self.close()
+        with open(self.path, "rb") as f:
+            try:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                self._data = b""    # NOTE: empty file can't be mapped
+        if stat != self._stat:
+            # File is changed, offsets are not valid anymore
+            self._starts = array('q', [0])
+            self._complete = False
+        self._stat = stat
+
+    def close(self):
+        """
+        Release mapping. File is mapped again on next access
+        """
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _index_next(self) -> bool:
+        """
+        Index one more line, returns False if all lines are indexed
+        """
+        if self._complete:
+            return False
+        if self._data is None:
+            self._map()
+        pos = self._data.find(b"\n", self._starts[-1])
+        if pos < 0:
+            self._complete = True
+            return False
+        self._starts.append(pos + 1)
+        return True
+
+    def _is_indexed(self, idx:int) -> bool:
+        while len(self._starts) <= idx:
+            if not self._index_next():
+                return False
+        return True
+
+    def _line(self, idx:int) -> str:
+        if self._data is None:
+            self._map()
+        start = self._starts[idx]
+        if self._is_indexed(idx + 1):
+            data = self._data[start:self._starts[idx+1]-1]
+        else:
+            data = self._data[start:]
+        for enc in self._encodings:
+            try:
+                return data.decode(enc).replace("\r", "") + "\n"
+            except UnicodeDecodeError:
+                pass
+        raise ValueError(
+            f"Failed to decode data using provided encodings!"
+            f" ({', '.join(self._encodings)})"
+        )
+
+    def __len__(self) -> int:
+        self._map()
+        while self._index_next():
+            pass
+        return len(self._starts)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        self._map()
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or not self._is_indexed(idx):
+            raise IndexError("Line index out of range")
+        return idx, self._line(idx)
+
+    def __iter__(self):
+        self._map()
+        idx = 0
+        while self._is_indexed(idx):
+            yield idx, self._line(idx)
+            idx += 1
+
+
 class SourceText:
     """
     Class for ops with text source
     """
     def __init__(self,
             source          :list,
-            lines           :list[str],
+            lines           :list[str]|MappedLines,
             format          :str=S_MARKDOWN,
             escape_symbol   :str|None=None,
             fenced_seq      :str|None=None,
@@ -45,7 +169,10 @@ class SourceText:
             frontmatter     :bool|None=None,
     ):
         self._source = [*source]
-        self._lines = list(enumerate(lines))
+        if isinstance(lines, MappedLines):
+            self._lines = lines
+        else:
+            self._lines = list(enumerate(lines))
         self.format = format
 
         # NOTE: set dummy values for type-hinting as actual values are applied in generalized way
@@ -66,6 +193,20 @@ class SourceText:
             spec[k] = v or SOURCE_FORMATS[format][S_SPEC][k]
             setattr(self, k, spec[k])
 
+    def close(self):
+        """
+        Release resources that are held by lines (i.e. memory mapping)
+        Lines are still accessible after that
+        """
+        if isinstance(self._lines, MappedLines):
+            self._lines.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
     @property
     def source(self) -> list:
         return [*self._source]
@@ -126,46 +267,80 @@ class SourceBinary:
 class Line:
     """
     Stands for every single line in text file
+    NOTE: source list is shared between lines, not copied
     """
+    __slots__ = ("idx", "content", "_source")
+
     def __init__(self, idx:int, content:str, source:list):
         self.idx = idx
         self.content = content
-        self.source = source + [idx]
+        self._source = source
         # TODO: line can have complicated history, need to take into account
         # for example: original line were modified by one tag,
         # then modified by another and so on
 
+    @property
+    def source(self) -> list:
+        return self._source + [self.idx]
+
     def raw_lines(self) -> list[str]:
         return [self.content]
 
     def flat_lines(self) -> list:
         return [self]
 
+    def shifted(self, delta:int):
+        """
+        Copy of line with index shifted by delta
+        """
+        return Line(self.idx + delta, self.content, self._source)
+
 
 class Fenced:
     """
     Contains all lines of fenced section
+    NOTE: source list is shared between fenced sections and lines, not copied
     """
+    __slots__ = ("idx", "kind", "content", "_source")
+
     def __init__(self, idx:int, kind:str, content:list[Line], source:list):
         self.idx = idx
         self.kind = kind
         self.content = [*content]
-        self.source = source + [idx]
+        self._source = source
+
+    @property
+    def source(self) -> list:
+        return self._source + [self.idx]
 
     def raw_lines(self) -> list[str]:
-        result = []
-        for v in self.content:
-            result += v.raw_lines()
-        return result
+        return [v.content for v in self.content]
 
     def flat_lines(self) -> list[Line]:
-        result = []
-        for v in self.content:
-            result += v.flat_lines()
-        return result
+        return [*self.content]
 
-def load_from_file(path:str) -> SourceText|SourceBinary:
+    def shifted(self, delta:int):
+        """
+        Copy of fenced section with indexes shifted by delta
+        """
+        return Fenced(
+            self.idx + delta,
+            self.kind,
+            [v.shifted(delta) for v in self.content],
+            self._source,
+        )
+
+def load_from_file(path:str, mapped:bool|None=None) -> SourceText|SourceBinary:
+    """
+    Load source from file
+    If mapped is True then text file is mapped into memory
+    and it's lines are decoded on demand. Mapping is released by
+    SourceText's close() (RawDocument does it once parsing is done)
+    If mapped is None then file is mapped if it's size is at least C_MAPPED_SIZE
+    """
     path = Path(path)
+    if mapped is None:
+        mapped = os.stat(path).st_size >= C_MAPPED_SIZE
     file_kind = None
     for k,v in SOURCE_FORMATS.items():
         if k == C_FALLBACK:
@@ -176,7 +351,9 @@ def load_from_file(path:str) -> SourceText|SourceBinary:
     if file_kind is None:
         file_kind = "markdown"
     file_spec = SOURCE_FORMATS[file_kind][S_SPEC]
-    if SOURCE_FORMATS[file_kind][S_KIND] == S_TEXT:
+    if SOURCE_FORMATS[file_kind][S_KIND] == S_TEXT and mapped:
+        result = SourceText([path], MappedLines(path), file_kind, **file_spec)
+    elif SOURCE_FORMATS[file_kind][S_KIND] == S_TEXT:
         with open(path, "rb") as f:
             data = f.read()
         lines = None
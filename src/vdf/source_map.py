@@ -0,0 +1,215 @@
+import json
+import struct
+from bisect import bisect_right
+from pathlib import Path
+from .literals import *
+
+# Compact indexed format of source maps
+#
+# Layout (little-endian):
+#   header  : magic, lines count, ranges count, sources count
+#   ranges  : fixed-size records (first line, source id, first source line)
+#             sorted by first line. Range lasts till next range's first line
+#   index   : fixed-size records (offset, size) of each source in blob
+#   blob    : interned sources (JSON, utf-8)
+#
+# Source is interned with line number of it's first item set to 0,
+# so consecutive lines from the same cell makes single range.
+# First source line of a range is _NO_LINE if source is used as is
+#
+# Line's source lookup is a binary search over ranges records,
+# so only a few records are read from file
+
+_MAGIC      = b"VDFMAP\x00\x01"
+_HEADER     = struct.Struct("<8sIII")
+_RANGE      = struct.Struct("<IIi")
+_SOURCE     = struct.Struct("<II")
+_NO_LINE    = -1
+_TEMPLATE   = '[["Template"]]'
+
+
+def map_entry(source) -> str:
+    """
+    Mapping info (description of line's source) for line's source
+    """
+    if source is None:
+        return _TEMPLATE
+    return json.dumps(source, separators=(',', ':'), default=str)
+
+
+def _source_key(source) -> tuple[str, int]:
+    """
+    Split source into interned part and line number of it's first item
+    """
+    if source is not None and len(source) > 0:
+        first = source[0]
+        if isinstance(first, (list, tuple)) and len(first) > 1 \
+                and isinstance(first[1], int) and not isinstance(first[1], bool):
+            return map_entry([[first[0], 0, *first[2:]], *source[1:]]), first[1]
+    return map_entry(source), _NO_LINE
+
+
+class SourceMapWriter:
+    """
+    Writes sources of lines into file one by one
+    so whole map is never kept in memory
+    For binary format only interned sources are kept in memory
+    """
+    def __init__(self, path, map_format:str=C_MAP_JSON):
+        """
+        path is either path to file or binary file object
+        """
+        if map_format not in (C_MAP_JSON, C_MAP_BINARY):
+            raise ValueError(f"Unknown source map format '{map_format}'!")
+        self.map_format = map_format
+        if isinstance(path, (str, Path)):
+            self._file = open(path, "wb")
+        else:
+            self._file = path
+        self._lines = 0
+        self._interned = {}
+        self._ranges = 0
+        self._range = None  # Last range, not yet written
+        if map_format == C_MAP_BINARY:
+            # NOTE: header is written when amounts are known
+            self._file.seek(_HEADER.size)
+
+    def add(self, source):
+        """
+        Add source of next line
+        """
+        line = self._lines
+        self._lines += 1
+        if self.map_format == C_MAP_JSON:
+            entry = map_entry(source).encode("utf-8")
+            self._file.write(entry if line == 0 else b"\n" + entry)
+            return
+        key, source_line = _source_key(source)
+        source_id = self._interned.setdefault(key, len(self._interned))
+        if self._range is not None:
+            r_line, r_id, r_source_line = self._range
+            if r_id == source_id and (
+                    r_source_line == _NO_LINE and source_line == _NO_LINE
+                    or r_source_line != _NO_LINE
+                    and r_source_line + line - r_line == source_line):
+                return
+            self._file.write(_RANGE.pack(*self._range))
+        self._range = (line, source_id, source_line)
+        self._ranges += 1
+
+    def close(self):
+        if self._file is None:
+            return
+        if self.map_format == C_MAP_BINARY:
+            if self._range is not None:
+                self._file.write(_RANGE.pack(*self._range))
+            blob = [v.encode("utf-8") for v in self._interned]
+            offset = 0
+            for v in blob:
+                self._file.write(_SOURCE.pack(offset, len(v)))
+                offset += len(v)
+            for v in blob:
+                self._file.write(v)
+            self._file.seek(0)
+            self._file.write(_HEADER.pack(
+                _MAGIC, self._lines, self._ranges, len(blob)))
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def save_source_map(path:str, sources, map_format:str=C_MAP_JSON):
+    """
+    Save sources of lines into file using specified format
+    """
+    with SourceMapWriter(path, map_format) as writer:
+        for v in sources:
+            writer.add(v)
+
+
+class SourceMap:
+    """
+    Read access to source map file
+    Format of file is detected automatically
+    NOTE: lines are numbered from 0
+    """
+    def __init__(self, path:str):
+        self.path = Path(path)
+        self._file = None
+        self._entries = None
+        self._ranges = {}
+        with open(self.path, "rb") as f:
+            header = f.read(_HEADER.size)
+        if len(header) == _HEADER.size and header[:len(_MAGIC)] == _MAGIC:
+            self.map_format = C_MAP_BINARY
+            _, self._lines, self._ranges_count, self._sources_count = \
+                _HEADER.unpack(header)
+            self._index_offset = _HEADER.size + self._ranges_count * _RANGE.size
+            self._blob_offset = \
+                self._index_offset + self._sources_count * _SOURCE.size
+        else:
+            self.map_format = C_MAP_JSON
+            with open(self.path, "r") as f:
+                data = f.read()
+            self._entries = data.split("\n") if len(data) > 0 else []
+            self._lines = len(self._entries)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._lines
+
+    def _read(self, offset:int, size:int) -> bytes:
+        if self._file is None:
+            self._file = open(self.path, "rb")
+        self._file.seek(offset)
+        return self._file.read(size)
+
+    def _range(self, idx:int) -> tuple[int, int, int]:
+        if idx not in self._ranges:
+            self._ranges[idx] = _RANGE.unpack(
+                self._read(_HEADER.size + idx * _RANGE.size, _RANGE.size))
+        return self._ranges[idx]
+
+    def _source(self, source_id:int) -> str:
+        offset, size = _SOURCE.unpack(self._read(
+            self._index_offset + source_id * _SOURCE.size, _SOURCE.size))
+        return self._read(self._blob_offset + offset, size).decode("utf-8")
+
+    def entry(self, line:int) -> str:
+        """
+        Mapping info of line, same as line of JSON map
+        """
+        if line < 0 or line >= self._lines:
+            raise IndexError(f"Line {line} is out of map's range!")
+        if self._entries is not None:
+            return self._entries[line]
+        idx = bisect_right(
+            range(self._ranges_count), line, key=lambda v: self._range(v)[0]) - 1
+        r_line, source_id, source_line = self._range(idx)
+        entry = self._source(source_id)
+        if source_line == _NO_LINE:
+            return entry
+        source = json.loads(entry)
+        source[0][1] = source_line + line - r_line
+        return map_entry(source)
+
+    def lookup(self, line:int) -> list:
+        """
+        Source of line
+        """
+        return json.loads(self.entry(line))
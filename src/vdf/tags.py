@@ -400,9 +400,10 @@ def parse_tags(lines:list[str]) -> TagsInstances:
 
     # First - join multi lines if there is any
     # TODO: if source already have joined multi lines - don't do this, just use first line
+    scanner = escape_scanner("\\", "#")
     magic_line = "\\"
     i = -1
-    while replace_escaped(magic_line, "_")[-1:] == "\\":
+    while magic_line[-1:] == "\\" and not scanner.is_escaped(magic_line, -1):
         i+=1
         if i == len(lines):
             raise ValueError("Not terminated multiline magic!")
@@ -411,27 +412,14 @@ def parse_tags(lines:list[str]) -> TagsInstances:
     if magic_line[:len(C_VDF_PREAMBLE)] == C_VDF_PREAMBLE:
         magic_line = magic_line[len(C_VDF_PREAMBLE):]
 
-    i = -1
-    stack = None
-    magic_line_e = replace_escaped(magic_line, "_")
-    prev_char_e = None
-    while i < len(magic_line)-1:
-        i += 1
-        char   = magic_line[i]
-        char_e = magic_line_e[i]
-
-        if char_e == "#" and (prev_char_e == " " or prev_char_e is None):
-            if stack is not None:
-                result.list.append(parse_tag(stack[1:].rstrip()))
-            stack = ""
-
-        prev_char_e = char_e
-        if stack is None:
-            continue
-        stack += char
-
-    if stack is not None:
-        result.list.append(parse_tag(stack[1:].rstrip()))
+    # Tag starts with unescaped '#' at line's start or after unescaped space
+    starts = [
+        pos for pos in scanner.positions(magic_line)
+        if pos == 0
+        or magic_line[pos-1] == " " and not scanner.is_escaped(magic_line, pos-1)
+    ]
+    for start, end in zip(starts, starts[1:] + [len(magic_line)]):
+        result.list.append(parse_tag(magic_line[start+1:end].rstrip()))
 
     return result
 
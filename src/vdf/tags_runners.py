@@ -1,10 +1,9 @@
-from copy import deepcopy
 from .literals import *
 from ..helpers import *
 from .input import Fenced as _Fenced
 from .tags import TagInstance as _TagInstance
 from .tags_phases import *
-from .files import InnerFile, OuterFile, default_target
+from .files import InnerFile, OuterFile, default_target, target_path
 from .context import RunContext, GeneratedLine
 
 
@@ -144,14 +143,10 @@ class _TagRunner:
             encoding:str,
             eol:str
     ) -> InnerFile:
-        chk_file = InnerFile(path, kind, encoding, eol)
-        lookup_file = None
-        for v in context.files.list:
-            if v.path == chk_file.path:
-                lookup_file = v
+        lookup_file = context.files.get(target_path(path, kind))
         if lookup_file is None:
-            context.files.list.append(chk_file)
-            lookup_file = chk_file
+            lookup_file = InnerFile(path, kind, encoding, eol)
+            context.files.insert(lookup_file)
         return lookup_file
 
     def _copy_file(
@@ -160,21 +155,10 @@ class _TagRunner:
             context_from:RunContext,
             context_to:RunContext
     ):
-        src_file = None
-        for v in context_from.files.list:
-            if v.path == path:
-                src_file = v
+        src_file = context_from.files.get(path)
         if src_file is None:
             raise ValueError(f"Path '{path}' is not found in source context")
-
-        idx = 0
-        while idx < len(context_to.files.list):
-            if context_to.files.list[idx].path == path:
-                break
-        if idx < len(context_to.files.list):
-            context_to.files.list[idx] = src_file
-        else:
-            context_to.files.list.append(src_file)
+        context_to.files.update(src_file)
 
     @not_implemented
     def _copy_vars(
@@ -273,6 +257,23 @@ class TagCode(_TagRunner):
             if cell.cell_kind == S_CODE_CELL:
                 lines = lines[2:-1]
 
+            # All lines of tag application share single context snapshot
+            lines_context = RunContext(
+                files   = None,
+                attrs   = cell.run_context.attrs.snapshot(),
+                vars    = cell.run_context.vars.snapshot(),
+                vdf_ver = cell.run_context.vdf_ver,
+            )
+
+            provenance = cell.run_context.provenance()
+            # Flows set by tag itself take precedence over flow attribute
+            if S_FLOW in tag.vars and tag.vars[S_FLOW].value is not None:
+                flows = tag.vars[S_FLOW].value.split(",")
+            else:
+                flows = cell.run_context.attrs.data.get(S_FLOW, None)
+                if isinstance(flows, str):
+                    flows = [flows]
+
             spi = 0
             section_part = section_parts[spi]
             for l in lines:
@@ -284,20 +285,26 @@ class TagCode(_TagRunner):
                             f" {cell.location}")
                     section_part = section_parts[spi]
                     continue
-                source = l.source
-                if not isinstance(l, GeneratedLine):
-                    source = [source]
-                source.append(cell.location+[S_CELL, tag.line, phase])
+                if not provenance:
+                    source = None
+                else:
+                    if isinstance(l, GeneratedLine):
+                        # NOTE: line's source is None if it were generated
+                        # while provenance were off
+                        source = [*(l.source or [])]
+                    else:
+                        source = [l.source]
+                    source.append(cell.location+[S_CELL, tag.line, phase])
+                if flows is None and isinstance(l, GeneratedLine):
+                    line_flows = l.flows
+                else:
+                    line_flows = flows
                 section_parts_lines[section_part].append(
                     GeneratedLine(
                         content = l.content,
                         source  = source,
-                        context = RunContext(
-                            files   = None,
-                            attrs   = deepcopy(cell.run_context.attrs),
-                            vars    = deepcopy(cell.run_context.vars),
-                            vdf_ver = cell.run_context.vdf_ver,
-                        )
+                        context = lines_context,
+                        flows   = line_flows,
                     )
                 )
 
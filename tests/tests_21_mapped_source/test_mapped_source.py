@@ -0,0 +1,108 @@
+import pytest
+import sys
+from pathlib import Path
+
+vdf_root_path = str((Path(__file__).absolute().parent.parent.parent).resolve())
+if vdf_root_path not in sys.path:
+    sys.path.insert(0, vdf_root_path)
+
+from tests.helpers import *
+from src.helpers import *
+from src.vdf.source_io import load_from_file, MappedLines
+from src.vdf.input import RawDocument
+
+
+def same_source(path:Path) -> dict:
+    """
+    Compare mapped source with eagerly loaded one
+    """
+    eager = load_from_file(path, mapped=False)
+    mapped = load_from_file(path, mapped=True)
+    result = to_dict(
+        lines = len(eager.lines),
+        same_lines = [*mapped.lines] == eager.lines,
+        same_doc = any_to_dict_list_scalar(RawDocument(mapped))
+            == any_to_dict_list_scalar(RawDocument(eager)),
+    )
+    # Lines are still accessible after mapping is released by parse
+    result["same_after_close"] = [*mapped.lines] == eager.lines
+    mapped.close()
+    return result
+
+
+def mapped_lines(path:Path) -> dict:
+    """
+    Make sure that mapping is released on close
+    and file is mapped again if it were changed
+    """
+    lines = MappedLines(path)
+    first = [*lines]
+    result = to_dict(lines = first)
+    lines.close()
+    result["same_after_close"] = [*lines] == first
+    # Rewrite file in place while it's mapped
+    with open(path, "ab") as f:
+        f.write(b"appended line\n")
+    result["after_append"] = [*lines]
+    with open(path, "wb") as f:
+        f.write(b"short\n")
+    result["after_truncate"] = [lines[i] for i in range(len(lines))]
+    # Replace file with another one
+    tmp_path = path.with_name(path.name + ".new")
+    tmp_path.write_bytes(b"replaced\r\nfile")
+    os.replace(tmp_path, path)
+    result["after_replace"] = [*lines]
+    with lines:
+        result["last"] = lines[-1]
+    return result
+
+
+def mapped_sources(input_path:Path, output_path:Path) -> dict:
+    result = {"files": {}}
+    # NOTE: only summary for documents of all tests
+    # so gold isn't changed when tests are added
+    documents = [
+        same_source(v) for v in sorted(Path("tests").glob("*/test/*/data.md"))]
+    result["documents_same"] = len(documents) > 0 and all(
+        v["same_lines"] and v["same_doc"] and v["same_after_close"]
+        for v in documents
+    )
+    files_path = output_path / "files"
+    files_path.mkdir()
+    for name, spec in load_jyt(input_path / "files.yaml").items():
+        path = files_path / f"{name}.md"
+        data = spec["eol"].join(spec["lines"])
+        if spec["final"]:
+            data += spec["eol"]
+        path.write_bytes(data.encode("utf-8"))
+        result["files"][name] = same_source(path)
+    result["mapped_lines"] = mapped_lines(files_path / "lf.md")
+    return result
+
+
+@pytest.mark.parametrize("test_set", list_tests(__file__, ["test","gold"]))
+def test_mapped_source(test_set):
+    """
+    Make sure that mapped source is same as loaded eagerly
+    """
+    input_path, gold_path, output_path = init_test_paths(__file__, test_set)
+
+    value = mapped_sources(input_path.relative_to(os.getcwd()), output_path)
+
+    result = any_to_dict_list_scalar(value)
+    save_jyt(result, output_path/"result.yaml")
+    save_jyt(result, output_path/"result.json")
+
+    expected = [True, False][test_set[:4] == "err_"]
+
+    assert same_as_gold(gold_path, output_path) == expected
+    assert value["documents_same"]
+
+
+if __name__ == "__main__":
+    """
+    NOTE: this branch is for debug purposes only
+    """
+    value = test_mapped_source("files-01-misc")
+    result = any_to_dict_list_scalar(value)
+    a = 1
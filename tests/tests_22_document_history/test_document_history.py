@@ -0,0 +1,76 @@
+import pytest
+import sys
+from pathlib import Path
+
+vdf_root_path = str((Path(__file__).absolute().parent.parent.parent).resolve())
+if vdf_root_path not in sys.path:
+    sys.path.insert(0, vdf_root_path)
+
+from tests.helpers import *
+from src.vdf.literals import *
+from src.helpers import *
+from tests.tests_10_read_the_doc.test_read_the_doc import parse_input_file
+from src.vdf.document import Document
+from src.vdf.processing import VdfProcessor
+
+
+def describe_stage(d:Document, names:list[str]) -> dict:
+    main = d.branches.by_name(C_MAIN)
+    result = to_dict(
+        episodes = 0 if main is None else len(main.arc.episodes),
+        names = {},
+        locations = {},
+    )
+    for name in names:
+        info = d.lookup_episode_by_cell_name(name)
+        result['names'][name] = None if info is None else info['episode_idx']
+        result['locations'][name] = [
+            v['episode_idx'] for v in d.lookup_episodes_by_location(
+                info['episode'].source_cell_location if info is not None else [])
+        ]
+    return result
+
+
+def document_history(doc:Document) -> dict:
+    vp = VdfProcessor()
+    stages = vp.process_doc(doc)
+    names = [c.name for _,_,c in stages[1:]]
+    result = to_dict(stages = [], fork = None)
+    for d, _, _ in stages:
+        result['stages'].append(describe_stage(d, names))
+
+    # Process last cell once more on top of an early stage
+    # Neither early stage nor following stages should be affected
+    fork, _ = vp.process_cell(stages[2][0], doc.source.cells[-1])
+    result['fork'] = describe_stage(fork, names)
+    result['stages_after_fork'] = [describe_stage(d, names) for d,_,_ in stages]
+    return result
+
+
+@pytest.mark.parametrize("test_set", list_tests(__file__, ["test","gold"]))
+def test_document_history(test_set):
+    """
+    Make sure that document's history lookups works properly
+    and document's stages are not affected by following changes
+    """
+    input_path, gold_path, output_path = init_test_paths(__file__, test_set)
+
+    doc = parse_input_file(input_path.relative_to(os.getcwd()) /"data.md")['doc']
+    value = document_history(doc)
+
+    result = any_to_dict_list_scalar(value)
+    save_jyt(result, output_path/"result.yaml")
+    save_jyt(result, output_path/"result.json")
+
+    expected = [True, False][test_set[:4] == "err_"]
+
+    assert same_as_gold(gold_path, output_path) == expected
+
+
+if __name__ == "__main__":
+    """
+    NOTE: this branch is for debug purposes only
+    """
+    value = test_document_history("markdown-vhdl-01-simple")
+    result = any_to_dict_list_scalar(value)
+    a = 1
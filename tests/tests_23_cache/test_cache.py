@@ -0,0 +1,115 @@
+import pytest
+import sys
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+import jinja2
+from jinja2.sandbox import ImmutableSandboxedEnvironment
+
+vdf_root_path = str((Path(__file__).absolute().parent.parent.parent).resolve())
+if vdf_root_path not in sys.path:
+    sys.path.insert(0, vdf_root_path)
+
+from tests.helpers import *
+from src.vdf.literals import *
+from src.helpers import *
+from tests.tests_10_read_the_doc.test_read_the_doc import parse_input_file
+from src.vdf.processing import VdfProcessor
+from src.vdf.cache import Cache, JinjaBytecodeCache
+from src.vdf.files_render import RenderJinja2, TemplatesCache, _SourceLoader
+
+
+def render_files(data_path:Path, cache:Cache, version:str) -> dict:
+    """
+    Process document with fresh templates environment that uses given cache
+    Jinja2's version is replaced with given one
+    """
+    env = ImmutableSandboxedEnvironment(
+        loader = _SourceLoader(),
+        bytecode_cache = JinjaBytecodeCache(cache),
+        cache_size = 0,
+    )
+    with mock.patch.object(RenderJinja2, "_jinja", env), \
+         mock.patch.object(RenderJinja2, "_templates", TemplatesCache(env)), \
+         mock.patch.object(jinja2, "__version__", version):
+        doc = parse_input_file(data_path)['doc']
+        stages = VdfProcessor().process_doc(doc)
+        context = stages[-1][2].output_context
+        return {f.path: f.saves() for f in context.files.iterate()}
+
+
+def entries_size(path:Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def run_cache(data_path:Path) -> dict:
+    """
+    Render document several times over same cache directory,
+    each time with fresh environment and cache
+    """
+    result = {}
+    with TemporaryDirectory() as cache_path:
+        cache_path = Path(cache_path)
+        files = {}
+
+        def run(name:str, version:str, max_size:int=C_CACHE_MAX_SIZE):
+            cache = Cache(cache_path, max_size)
+            files[name] = render_files(data_path, cache, version)
+            stats = cache.stats()
+            result[name] = to_dict(
+                hits = stats['hits'],
+                misses = stats['misses'],
+                entries = stats['entries'],
+                same_as_cold = files[name] == files["cold"],
+            )
+
+        run("cold", "1.0")
+        # Fresh environment gets templates' bytecode from cache
+        run("warm", "1.0")
+        # Bytecode of other Jinja2's version is not used
+        run("other_version", "2.0")
+        # Least recently used entries are evicted when limit is exceeded
+        # NOTE: amount of kept entries depends on bytecode's size,
+        # so only whether entries were evicted is checked
+        max_size = entries_size(cache_path)
+        entries = result["other_version"]['entries']
+        run("evicted", "3.0", max_size)
+        evicted = result["evicted"]
+        evicted['evicted'] = evicted.pop('entries') < entries + evicted['misses']
+        evicted['within_limit'] = entries_size(cache_path) <= max_size
+        # Recently used entries are kept
+        run("after_eviction", "3.0", max_size)
+        result["after_eviction"].pop('entries')
+
+        result['disabled'] = Cache(cache_path, enabled=False).stats()['entries']
+
+    result['files'] = files["cold"]
+    return result
+
+
+@pytest.mark.parametrize("test_set", list_tests(__file__, ["test","gold"]))
+def test_cache(test_set):
+    """
+    Make sure that templates' bytecode is taken from on-disk cache
+    by fresh environment, and that cache is bounded and versioned
+    """
+    input_path, gold_path, output_path = init_test_paths(__file__, test_set)
+
+    value = run_cache(input_path.relative_to(os.getcwd()) /"data.md")
+
+    result = any_to_dict_list_scalar(value)
+    save_jyt(result, output_path/"result.yaml")
+    save_jyt(result, output_path/"result.json")
+
+    expected = [True, False][test_set[:4] == "err_"]
+
+    assert same_as_gold(gold_path, output_path) == expected
+
+
+if __name__ == "__main__":
+    """
+    NOTE: this branch is for debug purposes only
+    """
+    value = test_cache("markdown-vhdl-01-lines")
+    result = any_to_dict_list_scalar(value)
+    a = 1
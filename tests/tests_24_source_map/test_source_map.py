@@ -0,0 +1,73 @@
+import pytest
+import sys
+from pathlib import Path
+
+vdf_root_path = str((Path(__file__).absolute().parent.parent.parent).resolve())
+if vdf_root_path not in sys.path:
+    sys.path.insert(0, vdf_root_path)
+
+from tests.helpers import *
+from src.vdf.literals import *
+from src.helpers import *
+from tests.tests_10_read_the_doc.test_read_the_doc import parse_input_file
+from src.vdf.document import Document
+from src.vdf.processing import VdfProcessor
+from src.vdf.source_map import SourceMap
+
+
+def save_maps(doc:Document, output_path:Path) -> dict:
+    stages = VdfProcessor().process_doc(doc)
+    result = {}
+    for f in stages[-1][2].output_context.files.iterate():
+        _, lines_map = f.saves(flow=None)
+        result[f.path] = {}
+        for map_format in (C_MAP_JSON, C_MAP_BINARY):
+            f.save(output_path / map_format, flow=None, map_format=map_format)
+            with SourceMap(output_path / map_format / f"{f.path}.map") as m:
+                result[f.path][map_format] = to_dict(
+                    map_format = m.map_format,
+                    lines = len(m),
+                    same = [m.entry(i) for i in range(len(m))] == lines_map,
+                    first = m.lookup(0),
+                )
+
+    # Same output without provenance and no map at all
+    stages = VdfProcessor(provenance=False).process_doc(doc)
+    for f in stages[-1][2].output_context.files.iterate():
+        path = output_path / "no_provenance"
+        f.save(path, flow=None)
+        result[f.path]["no_provenance"] = to_dict(
+            map = f.saves(flow=None)[1],
+            map_saved = (path / f"{f.path}.map").exists(),
+            same = (path / f.path).read_bytes()
+                == (output_path / C_MAP_JSON / f.path).read_bytes(),
+        )
+    return result
+
+
+@pytest.mark.parametrize("test_set", list_tests(__file__, ["test","gold"]))
+def test_source_map(test_set):
+    """
+    Make sure that source maps are saved and looked up properly in all formats
+    """
+    input_path, gold_path, output_path = init_test_paths(__file__, test_set)
+
+    doc = parse_input_file(input_path.relative_to(os.getcwd()) /"data.md")['doc']
+    value = save_maps(doc, output_path)
+
+    result = any_to_dict_list_scalar(value)
+    save_jyt(result, output_path/"result.yaml")
+    save_jyt(result, output_path/"result.json")
+
+    expected = [True, False][test_set[:4] == "err_"]
+
+    assert same_as_gold(gold_path, output_path) == expected
+
+
+if __name__ == "__main__":
+    """
+    NOTE: this branch is for debug purposes only
+    """
+    value = test_source_map("markdown-vhdl-01-simple")
+    result = any_to_dict_list_scalar(value)
+    a = 1
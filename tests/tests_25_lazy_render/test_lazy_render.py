@@ -0,0 +1,72 @@
+import pytest
+import sys
+from pathlib import Path
+
+vdf_root_path = str((Path(__file__).absolute().parent.parent.parent).resolve())
+if vdf_root_path not in sys.path:
+    sys.path.insert(0, vdf_root_path)
+
+from tests.helpers import *
+from src.helpers import *
+from tests.tests_10_read_the_doc.test_read_the_doc import parse_input_file
+from src.vdf.processing import VdfProcessor
+
+
+def stages_files(stages) -> list[list]:
+    """
+    Produced files of each processed cell
+    """
+    return [
+        [*v[2].output_context.files.iterate()]
+        for v in stages if v[2] is not None
+    ]
+
+
+def rendered(stages) -> list[dict]:
+    return [{f.path: f.rendered is not None for f in v} for v in stages_files(stages)]
+
+
+def lazy_render(data_path:Path) -> dict:
+    eager = VdfProcessor().process_doc(parse_input_file(data_path)['doc'])
+    lazy = VdfProcessor(lazy_render=True).process_doc(parse_input_file(data_path)['doc'])
+    result = to_dict(
+        eager_rendered = rendered(eager),
+        lazy_rendered = rendered(lazy),
+    )
+    eager_files = stages_files(eager)[-1]
+    lazy_files = stages_files(lazy)[-1]
+    result["saves"] = {f.path: f.saves(flow=None) for f in lazy_files}
+    result["same_as_eager"] = \
+        result["saves"] == {f.path: f.saves(flow=None) for f in eager_files}
+    # Only files which output were required are rendered
+    result["lazy_rendered_after_saves"] = rendered(lazy)
+    return result
+
+
+@pytest.mark.parametrize("test_set", list_tests(__file__, ["test","gold"]))
+def test_lazy_render(test_set):
+    """
+    Make sure that lazy render produces same output as eager one
+    and files are rendered only when their output is required
+    """
+    input_path, gold_path, output_path = init_test_paths(__file__, test_set)
+
+    value = lazy_render(input_path.relative_to(os.getcwd()) /"data.md")
+
+    result = any_to_dict_list_scalar(value)
+    save_jyt(result, output_path/"result.yaml")
+    save_jyt(result, output_path/"result.json")
+
+    expected = [True, False][test_set[:4] == "err_"]
+
+    assert same_as_gold(gold_path, output_path) == expected
+    assert value["same_as_eager"]
+
+
+if __name__ == "__main__":
+    """
+    NOTE: this branch is for debug purposes only
+    """
+    value = test_lazy_render("markdown-vhdl-01-simple")
+    result = any_to_dict_list_scalar(value)
+    a = 1
@@ -0,0 +1,55 @@
+import pytest
+import sys
+from pathlib import Path
+
+vdf_root_path = str((Path(__file__).absolute().parent.parent.parent).resolve())
+if vdf_root_path not in sys.path:
+    sys.path.insert(0, vdf_root_path)
+
+from tests.helpers import *
+from src.helpers import *
+from tests.tests_10_read_the_doc.test_read_the_doc import parse_input_file
+from src.vdf.document import Document
+from src.vdf.processing import VdfProcessor
+
+
+C_FLOWS = ["sim", "synth", "formal"]
+
+
+def save_flows(doc:Document) -> dict:
+    stages = VdfProcessor().process_doc(doc)
+    files = {}
+    for f in stages[-1][2].output_context.files.iterate():
+        files[f.path] = {k: v[0] for k, v in f.saves(flow=C_FLOWS).items()}
+        files[f.path]["__all__"] = f.saves(flow=None)[0]
+    return files
+
+
+@pytest.mark.parametrize("test_set", list_tests(__file__, ["test","gold"]))
+def test_flows(test_set):
+    """
+    Make sure that lines tagged for flows are saved only into their flows
+    """
+    input_path, gold_path, output_path = init_test_paths(__file__, test_set)
+
+    doc = parse_input_file(input_path.relative_to(os.getcwd()) /"data.md")['doc']
+    value = save_flows(doc)
+
+    result = any_to_dict_list_scalar(value)
+    save_jyt(result, output_path/"result.yaml")
+    save_jyt(result, output_path/"result.json")
+
+    expected = [True, False][test_set[:4] == "err_"]
+
+    assert same_as_gold(gold_path, output_path) == expected
+    for v in value.values():
+        assert v["sim"] != v["synth"]
+
+
+if __name__ == "__main__":
+    """
+    NOTE: this branch is for debug purposes only
+    """
+    value = test_flows("markdown-vhdl-01-flows")
+    result = any_to_dict_list_scalar(value)
+    a = 1
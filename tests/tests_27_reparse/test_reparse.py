@@ -0,0 +1,102 @@
+import pytest
+import sys
+from pathlib import Path
+
+vdf_root_path = str((Path(__file__).absolute().parent.parent.parent).resolve())
+if vdf_root_path not in sys.path:
+    sys.path.insert(0, vdf_root_path)
+
+from tests.helpers import *
+from src.helpers import *
+from src.vdf.source_io import SourceText, load_from_file
+from src.vdf.input import RawDocument
+
+
+def make_source(source:SourceText, lines:list[str]) -> SourceText:
+    """
+    Source with same spec as given one but with other lines
+    """
+    return SourceText(
+        source.source,
+        lines,
+        source.format,
+        escape_symbol = source.escape_symbol,
+        fenced_seq    = source.fenced_seq,
+        fenced_regex  = source.fenced_regex,
+        cells_split   = source.cells_split,
+        frontmatter   = source.frontmatter,
+    )
+
+
+def cell_lines(cell) -> list[int]:
+    return [v.idx for v in cell.flat_lines()]
+
+
+def reparse_edits(input_path:Path) -> dict:
+    source = load_from_file(input_path / "data.md")
+    lines = [v for _, v in source.lines]
+    edits = load_jyt(input_path / "edits.yaml")
+    result = {}
+    for name, edit in edits.items():
+        start, end = edit["start"], edit["end"]
+        new_lines = [*lines[:start], *[v + "\n" for v in edit["lines"]], *lines[end:]]
+        new_end = start + len(edit["lines"])
+        delta = new_end - end
+
+        doc = RawDocument(make_source(source, lines))
+        before = [*doc.cells.cells]
+        doc.reparse(make_source(source, new_lines), start, end, new_end)
+        fresh = RawDocument(make_source(source, new_lines))
+
+        # Cells that aren't touched by edit are expected to be same objects
+        # (cells after edit only if amount of lines is kept)
+        fresh_cells = {
+            tuple(v.location): any_to_dict_list_scalar(v)
+            for v in fresh.cells.cells
+        }
+        untouched = [
+            v for v in before
+            if tuple(v.location) in fresh_cells
+            and fresh_cells[tuple(v.location)] == any_to_dict_list_scalar(v)
+            and (max(cell_lines(v)) < start
+                 or delta == 0 and min(cell_lines(v)) >= end)
+        ]
+        reused = [v for v in untouched if any(v is vv for vv in doc.cells.cells)]
+        result[name] = to_dict(
+            same_as_fresh = any_to_dict_list_scalar(doc)
+                == any_to_dict_list_scalar(fresh),
+            cells = len(doc.cells.cells),
+            untouched = [v.location for v in untouched],
+            untouched_reused = len(reused) == len(untouched),
+        )
+    return result
+
+
+@pytest.mark.parametrize("test_set", list_tests(__file__, ["test","gold"]))
+def test_reparse(test_set):
+    """
+    Make sure that document parsed incrementally after edit
+    is same as parsed from scratch
+    """
+    input_path, gold_path, output_path = init_test_paths(__file__, test_set)
+
+    value = reparse_edits(input_path.relative_to(os.getcwd()))
+
+    result = any_to_dict_list_scalar(value)
+    save_jyt(result, output_path/"result.yaml")
+    save_jyt(result, output_path/"result.json")
+
+    expected = [True, False][test_set[:4] == "err_"]
+
+    assert same_as_gold(gold_path, output_path) == expected
+    for v in value.values():
+        assert v["same_as_fresh"] and v["untouched_reused"]
+
+
+if __name__ == "__main__":
+    """
+    NOTE: this branch is for debug purposes only
+    """
+    value = test_reparse("markdown-01-edits")
+    result = any_to_dict_list_scalar(value)
+    a = 1
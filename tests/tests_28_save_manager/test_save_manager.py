@@ -0,0 +1,114 @@
+import pytest
+import sys
+from pathlib import Path
+
+vdf_root_path = str((Path(__file__).absolute().parent.parent.parent).resolve())
+if vdf_root_path not in sys.path:
+    sys.path.insert(0, vdf_root_path)
+
+from tests.helpers import *
+from src.vdf.literals import *
+from src.helpers import *
+from tests.tests_10_read_the_doc.test_read_the_doc import parse_input_file
+from src.vdf.document import Document
+from src.vdf.processing import VdfProcessor
+from src.vdf.context import GeneratedLine
+from src.vdf.files import InnerFile, FILE_KIND_TXT
+from src.vdf.output import SaveManager
+
+
+C_KEEP = "docs/keep.txt"    # Not managed file within output directory
+C_NOTES = "docs/notes/notes"    # Saved file that is removed at the end
+
+
+def text_file(path:str, lines:list[str], context) -> InnerFile:
+    file = InnerFile(path, FILE_KIND_TXT)
+    file.modify(S_RAW, [
+        GeneratedLine(v, [[path, i]], context) for i, v in enumerate(lines)
+    ])
+    file.render(context)
+    return file
+
+
+def listing(path:Path) -> list[str]:
+    return sorted(str(v.relative_to(path)) for v in path.rglob("*"))
+
+
+def mtimes(path:Path) -> dict:
+    return {v: (path / v).stat().st_mtime_ns for v in listing(path)}
+
+
+def save_steps(doc:Document, output_path:Path) -> dict:
+    stages = VdfProcessor().process_doc(doc)
+    context = stages[-1][2].output_context
+    files = [*context.files.iterate()]
+    notes = text_file(C_NOTES, ["first", "second"], context)
+    result = {}
+    for map_format in (C_MAP_JSON, C_MAP_BINARY):
+        path = output_path / map_format
+        path.mkdir()
+        (path / C_KEEP).parent.mkdir(parents=True)
+        (path / C_KEEP).write_text("not managed")
+        manager = SaveManager(path, map_format=map_format)
+        steps = {}
+        steps["initial"] = manager.save(files + [notes])
+        # NOTE: pretend files were saved long ago
+        # so rewrite is noticed even with coarse mtime resolution
+        for v in listing(path):
+            os.utime(path / v, ns=(0, 0))
+        before = mtimes(path)
+        steps["unchanged"] = manager.save(files + [notes])
+        steps["unchanged_mtimes_kept"] = mtimes(path) == before
+
+        (path / files[0].path).write_text("modified outside")
+        steps["modified_outside"] = manager.save(files + [notes])
+        notes = text_file(C_NOTES, ["first", "changed", "third"], context)
+        steps["changed"] = manager.save(files + [notes])
+        notes = text_file(C_NOTES, ["first"], context)
+        steps["truncated"] = manager.save(files + [notes])
+        steps["truncated_content"] = (path / notes.path).read_text()
+        fresh_path = output_path / "fresh" / map_format
+        (fresh_path / notes.path).parent.mkdir(parents=True)
+        notes.write(
+            fresh_path / notes.path,
+            fresh_path / f"{notes.path}.map",
+            map_format=map_format,
+        )
+        steps["truncated_same_as_fresh"] = all(
+            (path / v).read_bytes() == (fresh_path / v).read_bytes()
+            for v in (notes.path, f"{notes.path}.map")
+        )
+
+        steps["removed"] = manager.save(files)
+        steps["listing"] = listing(path)
+        steps["keep_mtime_kept"] = (path / C_KEEP).stat().st_mtime_ns == 0
+        result[map_format] = steps
+    return result
+
+
+@pytest.mark.parametrize("test_set", list_tests(__file__, ["test","gold"]))
+def test_save_manager(test_set):
+    """
+    Make sure that only changed files are written and absent files are removed
+    """
+    input_path, gold_path, output_path = init_test_paths(__file__, test_set)
+
+    doc = parse_input_file(input_path.relative_to(os.getcwd()) /"data.md")['doc']
+    value = save_steps(doc, output_path)
+
+    result = any_to_dict_list_scalar(value)
+    save_jyt(result, output_path/"result.yaml")
+    save_jyt(result, output_path/"result.json")
+
+    expected = [True, False][test_set[:4] == "err_"]
+
+    assert same_as_gold(gold_path, output_path) == expected
+
+
+if __name__ == "__main__":
+    """
+    NOTE: this branch is for debug purposes only
+    """
+    value = test_save_manager("markdown-vhdl-01-simple")
+    result = any_to_dict_list_scalar(value)
+    a = 1
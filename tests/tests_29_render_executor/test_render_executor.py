@@ -0,0 +1,105 @@
+import pytest
+import sys
+from pathlib import Path
+
+vdf_root_path = str((Path(__file__).absolute().parent.parent.parent).resolve())
+if vdf_root_path not in sys.path:
+    sys.path.insert(0, vdf_root_path)
+
+from tests.helpers import *
+from src.vdf.literals import *
+from src.helpers import *
+from tests.tests_10_read_the_doc.test_read_the_doc import parse_input_file
+from src.vdf.document import Document
+from src.vdf.processing import VdfProcessor
+from src.vdf.context import GeneratedLine
+from src.vdf.files import InnerFile, RenderExecutor
+
+
+C_UNITS = 4     # Amount of files that are derived from each document's file
+
+
+def derived_files(doc_files:list, context) -> list:
+    """
+    Several files for each file of the document
+    Each file gets all lines of document's file and a few lines of it's own
+    """
+    result = []
+    for f in doc_files:
+        for i in range(C_UNITS):
+            file = InnerFile(f"{f.path.replace('.', '_')}_{i}", f.kind)
+            for section, subsections in f.sections_data.items():
+                for subsection, lines in subsections.items():
+                    file.modify(section, [*lines], subsection)
+            file.modify([*f.sections_data][-1], [
+                GeneratedLine(f"-- unit {i} line {j}", [[file.path, j]], context)
+                for j in range(i + 1)
+            ])
+            result.append(file)
+    return result
+
+
+def modify(files:list, context):
+    """
+    Change some of files so they should be rendered again
+    """
+    for f in files[::2]:
+        f.modify([*f.sections_data][-1], [
+            GeneratedLine("-- modified", [[f.path, "modified"]], context)])
+
+
+def render_files(doc:Document) -> dict:
+    stages = VdfProcessor().process_doc(doc)
+    context = stages[-1][2].output_context
+    doc_files = [*context.files.iterate()]
+    results = {}
+    for kind in (None, C_THREADS, C_PROCESSES):
+        files = derived_files(doc_files, context)
+        executor = RenderExecutor(kind, max_workers=2) if kind else None
+        rounds = []
+        try:
+            for _ in range(2):
+                if executor is None:
+                    for f in files:
+                        f.render(context)
+                else:
+                    executor.render(files, context)
+                rounds.append({f.path: f.saves() for f in files})
+                modify(files, context)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        results[kind or "serial"] = rounds
+    return to_dict(
+        files = results["serial"],
+        threads_same = results[C_THREADS] == results["serial"],
+        processes_same = results[C_PROCESSES] == results["serial"],
+    )
+
+
+@pytest.mark.parametrize("test_set", list_tests(__file__, ["test","gold"]))
+def test_render_executor(test_set):
+    """
+    Make sure that files rendered concurrently are same as rendered serially
+    """
+    input_path, gold_path, output_path = init_test_paths(__file__, test_set)
+
+    doc = parse_input_file(input_path.relative_to(os.getcwd()) /"data.md")['doc']
+    value = render_files(doc)
+
+    result = any_to_dict_list_scalar(value)
+    save_jyt(result, output_path/"result.yaml")
+    save_jyt(result, output_path/"result.json")
+
+    expected = [True, False][test_set[:4] == "err_"]
+
+    assert same_as_gold(gold_path, output_path) == expected
+
+
+if __name__ == "__main__":
+    """
+    NOTE: this branch is for debug purposes only
+    """
+    value = test_render_executor("markdown-vhdl-01-multi")
+    result = any_to_dict_list_scalar(value)
+    a = 1